@@ -0,0 +1,176 @@
+"""
+Animated margins plots: the margins of the queried teams build up game by game
+through the season, as a GIF or MP4 clip. Unlike plotting.lineplot(), the
+figure is only drawn once. Everything that stays the same (axes, labels,
+legend) is kept as a background image; for every frame, only the axes area
+is restored from it and the lines, which are created once and updated with
+set_data(), are drawn on top (blitting). Each frame is piped to ffmpeg as soon
+as it has been drawn, so no frames are kept in memory.
+"""
+import os
+import lazy
+import shutil
+import plotting
+import profiling
+import itertools
+import subprocess
+
+mpl = lazy.module("matplotlib")
+style = lazy.module("matplotlib.style")
+figure = lazy.module("matplotlib.figure")
+backend_agg = lazy.module("matplotlib.backends.backend_agg")
+np = lazy.module("numpy")
+
+
+FORMATS = ("gif", "mp4")
+# frames (i.e. games) per second
+FPS = 10
+# seconds the complete season is shown at the end of the clip
+HOLD = 2
+# resolution of the clip (the figure is 16 x 9 inches like in lineplot())
+DPI = 80
+
+
+def clip_format(path):
+    """
+    Returns the format of the clip 'path' by its extension (None if it is no
+    supported format).
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in FORMATS else None
+
+
+def encoder_available():
+    """
+    Checks whether ffmpeg (as configured for matplotlib) can be found.
+    """
+    return shutil.which(mpl.rcParams["animation.ffmpeg_path"]) is not None
+
+
+def _encoder(path, width, height, fps):
+    """
+    Starts ffmpeg, which reads raw RGBA frames of 'width' x 'height' pixels
+    from its stdin and encodes them into 'path'.
+    """
+    command = [
+        mpl.rcParams["animation.ffmpeg_path"], "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(fps),
+        "-i", "-"
+    ]
+    if clip_format(path) == "gif":
+        # one palette per frame, so that ffmpeg does not have to hold back
+        # all frames to compute one for the whole clip
+        command += ["-filter_complex", "split[a][b];[a]palettegen=stats_mode=single[p];[b][p]paletteuse=new=1"]
+    else:
+        # (H.264 needs an even width and height)
+        command += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p"]
+    return subprocess.Popen(command + [path], stdin=subprocess.PIPE)
+
+
+def _figure(data, teams, season, dpi):
+    """
+    Creates the figure of the clip with all of its artists. The lines are
+    empty and 'animated', i.e. they are left out when the figure is drawn, and
+    the axes limits are fixed to the whole season, so that the drawn figure
+    can serve as the background of every frame.
+
+    Returns:
+        :return Figure canvas, axes, legend, game counter (Text), and the
+                lines with the values they show in the end ((Line2D, ndarray)
+                tuples)
+    """
+    fig = figure.Figure(figsize=(16, 9), dpi=dpi)
+    canvas = backend_agg.FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    colors = itertools.cycle(mpl.rcParams["axes.prop_cycle"].by_key()["color"])
+
+    lines = []
+    for team in teams:
+        # same colors and line styles as in plotting.lineplot()
+        team_color = next(colors)
+        columns = [
+            (f"{team}_margin", dict(linewidth=2, alpha=0.2, label=team)),
+            (f"{team}_smoothed", dict(linewidth=3, linestyle="dashed", label=f"{team} smooth")),
+        ]
+        overlays = [col for col in data.columns if col.startswith(f"{team}_smoothed ")]
+        for col, linestyle in zip(overlays, itertools.cycle(plotting.OVERLAY_STYLES)):
+            columns.append((col, dict(linewidth=2, linestyle=linestyle, label=f"{team} {col.split(' ', 1)[1]}")))
+        for col, kwargs in columns:
+            line, = ax.plot([], [], color=team_color, animated=True, **kwargs)
+            lines.append((line, data[col].to_numpy(dtype=float)))
+
+    values = data.to_numpy(dtype=float)
+    low, high = np.nanmin(values), np.nanmax(values)
+    pad = 0.05 * (high - low) or 1
+    ax.set_xlim(data.index[0] - 1, data.index[-1] + 1)
+    ax.set_ylim(low - pad, high + pad)
+
+    ax.axhline(y=0, color="dimgray", linewidth=1)
+    ax.grid(axis="x")
+    legend = ax.legend(loc="upper left", ncol=len(teams) // 8 + 1)
+    counter = ax.text(0.99, 0.03, "", transform=ax.transAxes, ha="right", fontsize="x-large", animated=True)
+    ax.set(
+        ylabel = "Winning / Losing Margin (points)",
+        xlabel = "Game No.",
+        title = f"Winning / losing margins for all games in {'NBA' if season >= 1950 else 'BAA'} season {season-1}/{season}"
+    )
+    return canvas, ax, legend, counter, lines
+
+
+@profiling.timed("animate")
+def animate(data, teams, season, path, fps=FPS, dpi=DPI):
+    """
+    Renders the margins of 'teams' in 'season' as a clip in which they build
+    up game by game. The smoothed margins are the ones of the whole season
+    (see sourcing.get_margins()), up to the game of the frame.
+
+    Args:
+        data (DataFrame): Winning/losing margins for all games in the season
+                          (see sourcing.margins_frame())
+        teams (list): The queried team(s)
+        season (int): The queried season
+        path (str): File of the clip, a GIF or an MP4 file (by extension)
+        fps (int): Games per second
+        dpi (int): Resolution of the clip
+
+    Returns:
+        :return Number of frames (int), raises a RuntimeError if ffmpeg is
+                not installed or fails
+    """
+    if not encoder_available():
+        raise RuntimeError("Animations require ffmpeg, which could not be found")
+
+    with style.context(plotting.STYLE):
+        canvas, ax, legend, counter, lines = _figure(data, teams, season, dpi)
+        canvas.draw()
+        background = canvas.copy_from_bbox(ax.bbox)
+        height, width = np.asarray(canvas.buffer_rgba()).shape[:2]
+
+        games = data.index.to_numpy()
+        encoder = _encoder(path, width, height, fps)
+        frames = 0
+        try:
+            for n in range(1, len(games) + 1):
+                canvas.restore_region(background)
+                for line, values in lines:
+                    line.set_data(games[:n], values[:n])
+                    ax.draw_artist(line)
+                counter.set_text(f"Game {games[n - 1]}")
+                ax.draw_artist(counter)
+                # (the legend is part of the background, but must stay on top
+                # of the lines)
+                ax.draw_artist(legend)
+                # the last frame is shown for HOLD seconds
+                repeats = fps * HOLD if n == len(games) else 1
+                with profiling.span("encode"):
+                    for _ in range(repeats):
+                        encoder.stdin.write(canvas.buffer_rgba())
+                frames += repeats
+        finally:
+            encoder.stdin.close()
+            returncode = encoder.wait()
+        canvas.figure.clear()
+
+    if returncode:
+        raise RuntimeError(f"ffmpeg failed to write {path} (exit code {returncode})")
+    return frames
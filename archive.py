@@ -0,0 +1,288 @@
+"""
+Archive of the per-game margins of every team in every season, for analytics
+across all of history without parsing game logs. The margins of all
+team-seasons are stored back to back in one flat file of float32 values (NaN
+for games without a result), which is memory-mapped, and an index file holds
+the offset and the number of games of every (team, season), or null for the
+teams whose game log could not be fetched (build() fetches them again).
+Opening the archive only maps the file; reading the margins of a team-season
+returns a read-only view of the mapped file (no copy), and only the pages of
+that slice are ever read from disk.
+
+Usage (from the root directory of the repository):
+    python archive.py --first 1947 --last 2022
+"""
+import os
+import json
+import lazy
+import cache
+import utils
+import argparse
+import fetching
+import franchises
+import urllib.error
+import warehouse
+
+np = lazy.module("numpy")
+
+
+# directory of the archive (can be redirected by setting the environment
+# variable BBREF_ARCHIVE_DIR)
+ARCHIVE_DIR = os.environ.get(
+    "BBREF_ARCHIVE_DIR",
+    os.path.join(cache.CACHE_DIR, "archive")
+)
+MARGINS_FILE = "margins.f32"
+INDEX_FILE = "index.json"
+# dtype of the margins file (little-endian, so that the archive can be copied
+# between machines)
+DTYPE = "<f4"
+
+# index {season: {team: (offset, number of games), or None if the game log of
+# the team could not be fetched}} and the mapped margins, loaded on first use
+_index = None
+_margins = None
+
+
+def game_margins(game_log):
+    """
+    Computes the margin of every game of a game log: the points of the team
+    minus the points of its opponent, at the position of the game number
+    (NaN for games without a result).
+
+    Args:
+        game_log (DataFrame): Game log with the columns G, Tm and Opp
+
+    Returns:
+        :return Margins (ndarray, one value per game)
+    """
+    games = game_log["G"].to_numpy(dtype=int) - 1
+    margins = np.full(max(len(game_log), games.max(initial=-1) + 1), np.nan)
+    margins[games] = np.subtract(
+        game_log["Tm"].to_numpy(dtype=float, na_value=np.nan),
+        game_log["Opp"].to_numpy(dtype=float, na_value=np.nan)
+    )
+    return margins
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        path = os.path.join(ARCHIVE_DIR, INDEX_FILE)
+        if os.path.isfile(path):
+            with open(path) as f:
+                _index = {int(season): teams for season, teams in json.load(f).items()}
+        else:
+            _index = {}
+    return _index
+
+
+def _mapped(end):
+    """
+    Returns the mapped margins file, mapping it (again) if it does not reach
+    up to 'end' yet, f. ex. because seasons have been added since.
+    """
+    global _margins
+    if _margins is None or len(_margins) < end:
+        _margins = np.memmap(os.path.join(ARCHIVE_DIR, MARGINS_FILE), dtype=DTYPE, mode="r")
+    return _margins
+
+
+def has_season(season):
+    """
+    Checks whether the margins of 'season' are in the archive.
+
+    Args:
+        season (int): The queried season
+
+    Returns:
+        :return True or False
+    """
+    return season in _load_index()
+
+
+def seasons():
+    """
+    Returns the seasons that are in the archive (sorted list).
+    """
+    return sorted(_load_index())
+
+
+def teams(season):
+    """
+    Returns the teams of 'season' that are in the archive.
+
+    Args:
+        season (int): The queried season
+
+    Returns:
+        :return List of abbreviations
+    """
+    return [team for team, entry in _load_index().get(season, {}).items() if entry is not None]
+
+
+def missing_teams(season):
+    """
+    Returns the teams of 'season' whose game log could not be fetched when the
+    season was added to the archive (list of abbreviations).
+    """
+    return [team for team, entry in _load_index().get(season, {}).items() if entry is None]
+
+
+def read(team, season):
+    """
+    Reads the margins of 'team' in 'season' from the archive.
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The queried season
+
+    Returns:
+        :return Margins (read-only float32 ndarray, a view of the mapped file,
+                one value per game), or None if they are not in the archive
+    """
+    entry = _load_index().get(season, {}).get(team)
+    if entry is None:
+        return None
+    offset, n_games = entry
+    return _mapped(offset + n_games)[offset:offset + n_games]
+
+
+def read_franchise(franchise, seasons):
+    """
+    Reads the margins of 'franchise' in all 'seasons' it played in and that
+    are in the archive, f. ex. for all seasons of the Oklahoma City Thunder
+    including those of the Seattle SuperSonics.
+
+    Args:
+        franchise (str): Abbreviation of the franchise
+        seasons (iterable): The queried seasons
+
+    Returns:
+        :return Dictionary with seasons (keys) and margins (values, see read())
+    """
+    margins = {}
+    for season in seasons:
+        team = franchises.code(franchise, season)
+        row = read(team, season) if team is not None else None
+        if row is not None:
+            margins[season] = row
+    return margins
+
+
+def _season_margins(season, season_teams=None):
+    """
+    Obtains the margins of all teams of 'season' (or only of 'season_teams'),
+    from the warehouse if the season has been backfilled, and by scraping
+    bbref otherwise.
+
+    Returns:
+        :return Dictionary with teams (keys) and margins (values), and the
+                teams whose game log could not be fetched (list)
+    """
+    season_teams = season_teams or franchises.teams(season)
+    if warehouse.has_season(season, "team_games"):
+        game_logs = {team: warehouse.read_team_games(team, season) for team in season_teams}
+    else:
+        pages = fetching.fetch_many(
+            [(utils.team_games_url(team, season), season) for team in season_teams],
+            return_exceptions=True
+        )
+        game_logs = {}
+        for team, page in zip(season_teams, pages):
+            if isinstance(page, urllib.error.HTTPError) and page.code == 404:
+                continue   # (no game log on bbref)
+            if isinstance(page, Exception):
+                raise page   # f. ex. a network error, the season is retried
+            game_logs[team] = utils.scrape_team_games(team, season)
+    margins = {team: game_margins(log) for team, log in game_logs.items() if not log.empty}
+    return margins, [team for team in season_teams if team not in margins]
+
+
+def add_season(season):
+    """
+    Appends the margins of all teams of 'season' to the archive. The teams
+    whose game log cannot be fetched are recorded as missing; if the season
+    is in the archive already, only those are fetched again. The margins are
+    written before the index, so an interrupted run never leaves index entries
+    without margins behind.
+
+    Args:
+        season (int): The season to add
+
+    Returns:
+        :return Abbreviations of the teams whose game log could not be fetched
+                (list)
+    """
+    global _index
+    index = dict(_load_index())
+    entries = dict(index.get(season, {}))
+    if entries and not missing_teams(season):
+        return []
+    # (the pages and tables of this season are dropped from the run store
+    # afterwards, everything else in it is kept)
+    stored = cache.stored_keys()
+    margins, missing = _season_margins(season, missing_teams(season))
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    # (margins an interrupted run has left behind without index entries are
+    # overwritten)
+    offset = max(
+        (entry[0] + entry[1] for teams in index.values() for entry in teams.values() if entry is not None),
+        default=0
+    )
+    with open(os.path.join(ARCHIVE_DIR, MARGINS_FILE), "ab") as f:
+        f.truncate(offset * np.dtype(DTYPE).itemsize)
+        for team, row in margins.items():
+            f.write(row.astype(DTYPE).tobytes())
+            entries[team] = (offset, len(row))
+            offset += len(row)
+    for team in missing:
+        entries[team] = None
+    index[season] = entries
+
+    path = os.path.join(ARCHIVE_DIR, INDEX_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({str(s): teams for s, teams in sorted(index.items())}, f)
+    os.replace(path + ".tmp", path)
+    _index = index
+    # free the memory of this season before the next one
+    cache.clear_run_store(cache.stored_keys() - stored)
+
+    return missing
+
+
+def build(first=warehouse.FIRST_SEASON, last=warehouse.LAST_SEASON):
+    """
+    Adds all seasons from 'first' to 'last' that are not in the archive yet,
+    and fetches the teams that were missing when a season was added again.
+    The running season is left out, as its margins still change.
+
+    Args:
+        first (int): First season to add
+        last (int): Last season to add
+
+    Returns:
+        :return None
+    """
+    seasons = [
+        s for s in range(first, min(last, cache.current_season() - 1) + 1)
+        if not has_season(s) or missing_teams(s)
+    ]
+    print(f"Adding {len(seasons)} season(s) to {ARCHIVE_DIR} ...")
+    for season in seasons:
+        try:
+            missing = add_season(season)
+        except Exception as error:
+            # not added, so it is retried on the next run
+            print(f"Season {season-1}/{season} failed: {error}")
+            continue
+        print(f"Season {season-1}/{season} done{f' (no game log for {missing})' if missing else ''}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mapped archive of the margins of all teams in all seasons.")
+    parser.add_argument("--first", type=int, default=warehouse.FIRST_SEASON, help="ending year of the first season")
+    parser.add_argument("--last", type=int, default=warehouse.LAST_SEASON, help="ending year of the last season")
+    args = parser.parse_args()
+    build(args.first, args.last)
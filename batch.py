@@ -0,0 +1,230 @@
+import csv
+import json
+import time
+import utils
+import archive
+import fetching
+import sourcing
+import smoothing
+import rendering
+import warehouse
+import franchises
+
+
+def read_jobs(path):
+    """
+    Reads the jobs from a JSONL file (one object per line) or a CSV file (with
+    a header line), each job consisting of an aspect, teams and a season (or
+    a span of seasons like "1990-2022"), and optionally the smoothings of the
+    margins (see smoothing.py). The teams (and smoothings) can be given as a
+    list or as a string in which they are separated by commas or semicolons,
+    f. ex.
+        {"aspect": "pts", "teams": ["MIA", "Dallas Mavericks"], "season": 2022}
+    or
+        aspect,teams,season
+        pts,"MIA, Dallas Mavericks",2022
+
+    Args:
+        path (str): Path of the job file
+
+    Returns:
+        :return List of jobs, each a dictionary with the keys "aspect", "teams"
+                (list of str), "season" (int or range) and "smoothings" (list
+                of str, or None)
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    return [read_job(row) for row in rows]
+
+
+def read_job(row):
+    """
+    Converts one row of a job file (see read_jobs()) into a job.
+
+    Args:
+        row (dict): The keys "aspect", "teams", "season" and optionally
+                    "smoothing" with the values given in the job file
+
+    Returns:
+        :return Job as dictionary with the keys "aspect", "teams" (list of str),
+                "season" (int or range) and "smoothings" (list of str, or None)
+    """
+    teams = row["teams"]
+    if isinstance(teams, str):
+        teams = teams.replace(";", ",").split(",")
+    smoothings = row.get("smoothing") or None
+    if isinstance(smoothings, str):
+        smoothings = smoothings.replace(";", ",").split(",")
+    return {
+        "aspect": row["aspect"].strip(),
+        "teams": [team.strip() for team in teams if team.strip()],
+        "season": utils.parse_seasons(str(row["season"])),
+        # may raise a ValueError
+        "smoothings": [smoothing.parse(spec) for spec in smoothings] if smoothings else None
+    }
+
+
+def to_query(job):
+    """
+    Checks the job like query_io.get_suitable_input() checks the input of the
+    terminal dialogue, and converts it into a query.
+
+    Args:
+        job (dict): Aspect, teams and season of the job
+
+    Returns:
+        :return Queried aspect, teams (bbref abbreviations) and season in a
+                3-place list, or None if the job cannot be carried out (in which
+                case the reason is printed)
+    """
+    aspect, season = job["aspect"], job["season"]
+    aspects = utils.aspect_info()
+    if aspect not in aspects:
+        print(f"Unknown aspect '{aspect}'.")
+        return None
+    min_season = aspects[aspect]["availability"]
+    seasons = season if isinstance(season, range) else [season]
+    if not (min_season <= seasons[0] and seasons[-1] <= 2022):
+        print(f"Data required for visualizing {aspects[aspect]['short']} is available from the season ending in {min_season} on, until the season ending in 2022.")
+        return None
+    if isinstance(season, range) and aspect == "mar":
+        print("Margins can only be visualized for a single season.")
+        return None
+
+    if [team.upper() for team in job["teams"]] == ["ALL"]:
+        return [aspect, franchises.all_teams(season), season]
+
+    teams = []
+    for team in job["teams"]:
+        if isinstance(season, range):
+            code = franchises.resolve_franchise(team, season)
+        else:
+            code = franchises.resolve(team, season)
+        if code is None:
+            print(f"It seems that '{team}' did not participate in {utils.season_label(season)}.")
+        else:
+            teams.append(code)
+    # remove duplicates while retaining order
+    teams = list(dict.fromkeys(teams))
+    if not teams:
+        return None
+    return [aspect, teams, season]
+
+
+def plan_fetches(queries):
+    """
+    Determines all pages required by 'queries'. Every page is listed once, no
+    matter how many queries require it, and pages whose data is in the
+    warehouse (or, for margins, in the archive) are left out.
+
+    Args:
+        queries (list): The queries of all jobs
+
+    Returns:
+        :return (url, season) tuples of the pages to fetch
+    """
+    pages = {}
+    for aspect, teams, season in queries:
+        if aspect == "mar":
+            if not warehouse.has_season(season, "team_games"):
+                for team in teams:
+                    if archive.read(team, season) is None:
+                        pages[utils.team_games_url(team, season)] = season
+        else:
+            for season in (season if isinstance(season, range) else [season]):
+                if not warehouse.has_season(season):
+                    pages[utils.season_stats_url(season)] = season
+    return list(pages.items())
+
+
+def run_batch(path, processes=None, bundle=None, smoothings=None):
+    """
+    Runs all jobs of the job file under 'path' without any dialogue. First,
+    all pages required by any job are fetched (concurrently, and each page
+    only once). Then, for each job the data is prepared like in the
+    interactive mode, and the plots are rendered and exported on a pool of
+    processes (see rendering.py), either to one file per plot or into a
+    single 'bundle'. The data of a job is only prepared when a worker is
+    about to become free for it, so the data of at most a few jobs is held
+    in memory at any time. Finally, a summary of the status and the duration
+    of every job is printed.
+
+    Args:
+        path (str): Path of the job file (see read_jobs())
+        processes (int): Number of rendering processes (defaults to the number
+                         of CPU cores)
+        bundle (str): Path of a PDF, ZIP or TAR file to write all plots into
+                      (see rendering.render_bundle()), instead of one PNG file
+                      per plot
+        smoothings (list): Smoothings of the margins for all jobs that do not
+                           specify their own
+
+    Returns:
+        :return None
+    """
+    jobs = read_jobs(path)
+    queries = [to_query(job) for job in jobs]
+
+    start = time.perf_counter()
+    pages = plan_fetches([query for query in queries if query is not None])
+    results = fetching.fetch_many(pages, return_exceptions=True)
+    failed = sum(isinstance(result, Exception) for result in results)
+    print(f"Fetched {len(pages) - failed} of {len(pages)} required pages in {time.perf_counter() - start:.1f}s.")
+
+    statuses = []
+    durations = []
+
+    def render_jobs():
+        # prepares the data of one job after the other, while the plots of
+        # the jobs before are rendered
+        n_rendered = 0
+        for job, query in zip(jobs, queries):
+            start = time.perf_counter()
+            status = "invalid"
+            prepared = None
+            if query is not None:
+                try:
+                    data, teams_updated = sourcing.get_data(query, terminate=False, smoothings=job["smoothings"] or smoothings)
+                    if not teams_updated:
+                        status = "no data"
+                    else:
+                        query[1] = teams_updated
+                        status = n_rendered   # index of its render job
+                        prepared = (data, query)
+                except Exception as error:
+                    status = f"failed ({type(error).__name__}: {error})"
+            statuses.append(status)
+            durations.append(time.perf_counter() - start)
+            if prepared is not None:
+                n_rendered += 1
+                yield prepared
+
+    if bundle:
+        rendered = rendering.render_bundle(render_jobs(), bundle, processes=processes)
+    else:
+        rendered = rendering.render_many(render_jobs(), processes=processes)
+
+    summary = []
+    for job, status, duration in zip(jobs, statuses, durations):
+        if isinstance(status, int):
+            result = rendered[status]
+            if isinstance(result, Exception):
+                status = f"failed ({type(result).__name__}: {result})"
+            else:
+                status, render_duration = result
+                duration += render_duration
+        summary.append((job, status, duration))
+
+    print(f"\n{'#':>4}  {'aspect':<7}{'teams':<24}{'season':<11}{'time':>8}  status")
+    for i, (job, status, duration) in enumerate(summary, start=1):
+        teams = ", ".join(job["teams"])
+        season = job["season"]
+        if isinstance(season, range):
+            season = f"{season[0]}-{season[-1]}"
+        print(f"{i:>4}  {job['aspect']:<7}{teams[:22]:<24}{season:<11}{duration:>7.2f}s  {status}")
+    if bundle and rendered:
+        print(f"\nAll plots have been written to {bundle}.")
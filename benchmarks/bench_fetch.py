@@ -0,0 +1,64 @@
+"""
+Load-tests fetching.fetch_many() against a local stand-in for bbref
+(transports.StandInServer serving generated pages with an artificial
+latency), once over the pooled keep-alive session of
+transports.LiveTransport and once opening a new connection per page like
+pandas.read_html(url) does.
+
+Usage (from the root directory of the repository):
+    python -m benchmarks.bench_fetch --pages 30 --latency 0.05
+"""
+import time
+import argparse
+import urllib.request
+import utils
+import fetching
+import franchises
+import transports
+from benchmarks import fixtures
+
+
+class _UrllibTransport(transports.LiveTransport):
+    """
+    Opens a new connection for every page and does not ask for compression.
+    """
+
+    def get(self, url):
+        url = self.base_url + url[len(transports.BASE_URL):]
+        with urllib.request.urlopen(url, timeout=transports.TIMEOUT) as response:
+            return response.read().decode("utf-8")
+
+
+def bench(transport, urls, workers):
+    """
+    Fetches all 'urls' via 'transport' with 'workers' threads.
+
+    Returns:
+        :return Duration in seconds
+    """
+    fetching.set_transport(transport)
+    start = time.perf_counter()
+    fetching.fetch_many([(url, 2022) for url in urls], max_workers=workers)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30, help="number of game log pages to fetch")
+    parser.add_argument("--latency", type=float, default=0.05, help="latency of the stand-in server in seconds")
+    parser.add_argument("--workers", type=int, default=fetching.MAX_WORKERS, help="concurrent downloads")
+    args = parser.parse_args()
+
+    teams = sorted(franchises.teams(2022))
+    urls = [utils.team_games_url(teams[i % len(teams)], 2022 - i // len(teams)) for i in range(args.pages)]
+
+    print(f"{'transport':<28}{'total':>10}{'per page':>12}")
+    with transports.StandInServer(fixtures.generate_page, latency=args.latency) as server:
+        for name, transport in [
+            ("new connection per page", _UrllibTransport(server.url)),
+            ("pooled keep-alive session", transports.LiveTransport(server.url, pool_size=args.workers)),
+        ]:
+            # every page is fetched anew
+            fixtures.reset(keep_pages=False)
+            duration = bench(transport, urls, args.workers)
+            print(f"{name:<28}{duration:>9.2f}s{duration/len(urls)*1000:>10.1f}ms")
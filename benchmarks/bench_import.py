@@ -0,0 +1,83 @@
+"""
+Measures how long it takes to start the program: the time to import each
+entry point (main.py, batch.py, service.py, watch.py) in a fresh interpreter,
+and which of the heavy dependencies are imported along with it. As importing
+main.py runs nothing (the dialogue is started under if __name__ ==
+"__main__"), the time until main.py asks for the first input is measured as
+well, with an input() that stops the program instead of waiting. For
+comparison, the time to import the heavy dependencies themselves is measured,
+which is what every start would cost if they were imported eagerly.
+
+Usage (from the root directory of the repository):
+    python -m benchmarks.bench_import --repeat 5
+"""
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+
+ENTRY_POINTS = ("main", "batch", "service", "watch")
+HEAVY = ("numpy", "pandas", "scipy", "matplotlib", "requests")
+# what the entry points imported before the heavy dependencies were imported
+# lazily
+EAGER = "import pandas, scipy.ndimage, matplotlib.style, matplotlib.figure, requests"
+
+# runs main.py up to the first prompt of the terminal dialogue
+PROMPT = """
+import runpy, builtins
+class FirstPrompt(Exception):
+    pass
+def stop(prompt=""):
+    raise FirstPrompt
+builtins.input = stop
+sys.argv = ["main.py"]
+try:
+    runpy.run_path("main.py", run_name="__main__")
+except FirstPrompt:
+    pass
+"""
+
+_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+duration = time.perf_counter() - start
+print(json.dumps([duration, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def measure(statement, repeat):
+    """
+    Runs 'statement' in 'repeat' fresh interpreters.
+
+    Returns:
+        :return Median duration in seconds, and the heavy dependencies that
+                were imported
+    """
+    durations = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _SCRIPT.format(statement=statement, heavy=HEAVY)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        # (the result is the last line, after f. ex. the menu of the dialogue)
+        duration, loaded = json.loads(output.splitlines()[-1])
+        durations.append(duration)
+    return statistics.median(durations), loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters started per measurement")
+    args = parser.parse_args()
+
+    print(f"{'import':<20}{'median':>10}  heavy dependencies imported")
+    for name in ENTRY_POINTS:
+        duration, loaded = measure(f"import {name}", args.repeat)
+        print(f"{name:<20}{duration*1000:>8.0f}ms  {', '.join(loaded) or '-'}")
+    duration, loaded = measure(PROMPT, args.repeat)
+    print(f"{'(first prompt)':<20}{duration*1000:>8.0f}ms  {', '.join(loaded) or '-'}")
+    duration, loaded = measure(EAGER, args.repeat)
+    print(f"{'(eager imports)':<20}{duration*1000:>8.0f}ms  {', '.join(loaded)}")
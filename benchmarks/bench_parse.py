@@ -0,0 +1,69 @@
+"""
+Compares parsing saved bbref pages with pandas.read_html() (all tables on the
+page) to the targeted extraction in parsing.py (only the required table).
+
+Usage (from the root directory of the repository):
+    python -m benchmarks.bench_parse NBA_2022.html MIA_2022_games.html ...
+
+Pages whose file name contains "_games" are treated as game log pages, all
+others as league pages.
+"""
+import io
+import sys
+import time
+import utils
+import parsing
+import argparse
+import statistics
+import pandas as pd
+
+
+def _time(function, repeat):
+    """
+    Calls 'function' 'repeat' times and returns the median duration in
+    seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def bench_page(path, repeat):
+    """
+    Times both ways of parsing the page stored under 'path'.
+
+    Args:
+        path (str): Path of the saved page
+        repeat (int): Number of repetitions per way of parsing
+
+    Returns:
+        :return Median durations of read_html() and of the targeted parser
+    """
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+
+    if "_games" in path:
+        full = lambda: list(pd.read_html(io.StringIO(html)))[0]
+        targeted = lambda: parsing.extract_table(html, parsing.TEAM_GAMES_IDS)
+    else:
+        full = lambda: utils._search_season_stats(html)
+        targeted = lambda: parsing.extract_table(html, parsing.SEASON_STATS_IDS)
+
+    if targeted() is None:
+        sys.exit(f"{path} does not contain the required table.")
+    return _time(full, repeat), _time(targeted, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="+", help="saved bbref pages")
+    parser.add_argument("--repeat", type=int, default=10, help="repetitions per page")
+    args = parser.parse_args()
+
+    print(f"{'page':<40}{'read_html':>12}{'targeted':>12}{'speedup':>10}")
+    for path in args.pages:
+        full, targeted = bench_page(path, args.repeat)
+        print(f"{path:<40}{full*1000:>10.1f}ms{targeted*1000:>10.1f}ms{full/targeted:>9.1f}x")
@@ -0,0 +1,242 @@
+"""
+Benchmarks the stages of the pipeline offline, on recorded or generated bbref
+pages (see benchmarks/fixtures.py): scraping and preparing the data, every
+plotting function, the export and the animation of margins (if ffmpeg is
+installed). Every stage is run for 1, 5 and 30 teams, and the stages that
+span seasons for 1, 10 and 76 seasons.
+
+Usage (from the root directory of the repository):
+    python -m benchmarks.bench_pipeline                  # compare to baseline
+    python -m benchmarks.bench_pipeline --save-baseline  # record new baseline
+    python -m benchmarks.bench_pipeline --pages pages/   # use recorded pages
+
+The results are compared to the baseline in benchmarks/baseline.json (if
+there is one); stages that take more than --tolerance longer than in the
+baseline are flagged as regressions, and the exit code is 1 if there are any.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import utils
+import archive
+import plotting
+import animation
+import query_io
+import sourcing
+import warehouse
+import franchises
+import matplotlib as mpl
+import matplotlib.style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from benchmarks import fixtures
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SEASON = 2022
+TEAM_COUNTS = (1, 5, 30)
+SEASON_COUNTS = (1, 10, 76)
+# franchises whose trends are benchmarked over several seasons
+TREND_TEAMS = ["BOS", "NYK", "LAL", "GSW", "PHI"]
+# differences below this are considered noise (seconds)
+NOISE = 0.002
+
+
+def _time(function, repeat, setup=None):
+    """
+    Calls 'function' 'repeat' times (after one warm-up call) and returns the
+    median duration in seconds. 'setup' is called before every call, outside
+    of the measurement.
+    """
+    durations = []
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        if i:
+            durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def _draw(plot_function, *args):
+    """
+    Creates a plot like plotting.visualize() does and draws it (which is where
+    matplotlib spends most of its time), without saving it.
+    """
+    with mpl.style.context(plotting.STYLE):
+        fig = plot_function(*args)
+    FigureCanvasAgg(fig).draw()
+    fig.clear()
+
+
+def _fresh(function, *args):
+    """
+    Returns a function that calls 'function' on fresh copies of the lists in
+    'args' (the sourcing functions remove teams from the lists they are
+    given) after removing all parsed tables from the run store.
+    """
+    def run():
+        fixtures.reset()
+        return function(*[list(arg) if isinstance(arg, list) else arg for arg in args])
+    return run
+
+
+def team_cases(n_teams):
+    """
+    Returns the benchmarks of all stages for the first 'n_teams' teams of
+    SEASON as (name, function, setup) tuples.
+    """
+    teams = sorted(franchises.teams(SEASON))[:n_teams]
+    suffix = f"{n_teams} team{'s' if n_teams > 1 else ''}"
+
+    margins, _ = _fresh(sourcing.get_margins, teams, SEASON)()
+    shooting, _ = _fresh(sourcing.get_season_stats, "acc", teams, SEASON)()
+    points, _ = _fresh(sourcing.get_season_stats, "pts", teams, SEASON)()
+    assists, _ = _fresh(sourcing.get_season_stats, "a/t", teams, SEASON)()
+
+    folder = tempfile.mkdtemp(prefix="bench-export-")
+
+    def export():
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            query_io.export(margins, ["mar", teams, SEASON], notify=False)
+        finally:
+            os.chdir(cwd)
+
+    def forget_exports():
+        manifest = os.path.join(folder, "visualizations", query_io.MANIFEST)
+        if os.path.isfile(manifest):
+            os.remove(manifest)
+
+    cases = [
+        (f"get_margins/{suffix}", _fresh(sourcing.get_margins, teams, SEASON), None),
+        (f"get_season_stats/{suffix}", _fresh(sourcing.get_season_stats, "pts", teams, SEASON), None),
+        (f"lineplot/{suffix}", lambda: _draw(plotting.lineplot, margins, teams, SEASON), None),
+        (f"scatterplot/{suffix}", lambda: _draw(plotting.scatterplot, assists, teams, SEASON), None),
+        (f"grouped_barplot/{suffix}", lambda: _draw(plotting.grouped_barplot, shooting, teams, SEASON), None),
+        (f"simple_barplot/{suffix}", lambda: _draw(plotting.simple_barplot, "pts", points, teams, SEASON), None),
+        (f"export/{suffix}", export, forget_exports),
+        (f"export (unchanged)/{suffix}", export, None),
+    ]
+    if animation.encoder_available():
+        clip = os.path.join(folder, "margins.mp4")
+        cases.append((f"animate/{suffix}", lambda: animation.animate(margins, teams, SEASON, clip), None))
+    return cases
+
+
+def season_cases(n_seasons):
+    """
+    Returns the benchmarks of the stages that span seasons for the last
+    'n_seasons' seasons up to SEASON as (name, function, setup) tuples.
+    """
+    seasons = range(SEASON - n_seasons + 1, SEASON + 1)
+    suffix = f"{n_seasons} season{'s' if n_seasons > 1 else ''}"
+
+    def scrape():
+        for season in seasons:
+            utils.scrape_season_stats(season)
+
+    cases = [(f"scrape_season_stats/{suffix}", scrape, fixtures.reset)]
+    if n_seasons > 1:
+        trends, teams = _fresh(sourcing.get_season_trends, "pts", TREND_TEAMS, seasons)()
+        cases += [
+            (f"get_season_trends/{suffix}", _fresh(sourcing.get_season_trends, "pts", TREND_TEAMS, seasons), None),
+            (f"trendplot/{suffix}", lambda: _draw(plotting.trendplot, "pts", trends, teams, seasons), None),
+        ]
+    return cases
+
+
+def run(repeat, pages_dir=None, only=None):
+    """
+    Seeds the fixtures and runs all benchmarks.
+
+    Args:
+        repeat (int): Number of measured runs per benchmark
+        pages_dir (str): Directory of recorded pages (optional)
+        only (str): Only run the benchmarks whose names contain this
+
+    Returns:
+        :return Median duration of every benchmark in seconds (dict)
+    """
+    fixtures.go_offline(pages_dir)
+    # the data must come from the fixtures, not from a local warehouse or
+    # margins archive
+    warehouse.WAREHOUSE_DIR = tempfile.mkdtemp(prefix="bench-warehouse-")
+    archive.ARCHIVE_DIR = tempfile.mkdtemp(prefix="bench-archive-")
+    # league pages of all seasons, game logs of all teams of SEASON
+    fixtures.seed(sorted(franchises.teams(SEASON)), [SEASON], pages_dir)
+    fixtures.seed([], range(SEASON - max(SEASON_COUNTS) + 1, SEASON + 1), pages_dir)
+
+    cases = [case for n in TEAM_COUNTS for case in team_cases(n)]
+    cases += [case for n in SEASON_COUNTS for case in season_cases(n)]
+
+    results = {}
+    for name, function, setup in cases:
+        if only and only not in name:
+            continue
+        results[name] = _time(function, repeat, setup)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the results next to the baseline and flags regressions.
+
+    Args:
+        results (dict): Median durations of this run
+        baseline (dict): Median durations of the baseline run
+        tolerance (float): Relative slowdown that is still accepted
+
+    Returns:
+        :return Names of the benchmarks that regressed (list)
+    """
+    regressions = []
+    print(f"{'benchmark':<40}{'median':>11}{'baseline':>11}{'change':>9}")
+    for name, duration in results.items():
+        line = f"{name:<40}{duration*1000:>9.1f}ms"
+        if name in baseline:
+            before = baseline[name]
+            line += f"{before*1000:>9.1f}ms{(duration/before - 1)*100:>+8.0f}%"
+            if duration > before * (1 + tolerance) and duration - before > NOISE:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="measured runs per benchmark")
+    parser.add_argument("--pages", metavar="DIR", help="directory of recorded pages")
+    parser.add_argument("--only", help="only run the benchmarks whose names contain this")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown flagged as regression")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.pages, args.only)
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "recorded": time.strftime("%Y-%m-%d %H:%M"),
+                "results": dict(baseline, **results)
+            }, f, indent=1)
+        print(f"\nThe baseline has been written to {args.baseline}.")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+        sys.exit(1)
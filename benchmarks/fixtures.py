@@ -0,0 +1,272 @@
+"""
+Fixtures for the offline benchmarks: bbref pages that are put into the run
+store (cache.run_store), so that the pipeline takes them from there instead
+of downloading them.
+
+Pages that have been recorded (saved from bbref, f. ex. with
+    python -m benchmarks.fixtures --record pages/ --season 2022 --teams MIA,BOS
+) are used as they are. All other pages are generated: synthetic league and
+game log pages with the same table layout as bbref's, plus some filler
+content, so that they are about as large as the real pages.
+"""
+import os
+import random
+import argparse
+import utils
+import cache
+import fetching
+import franchises
+import transports
+
+
+# columns of the per-game statistics table on a league page
+SEASON_STATS_COLS = [
+    "Rk", "Team", "G", "MP", "FG", "FGA", "FG%", "3P", "3PA", "3P%", "2P",
+    "2PA", "2P%", "FT", "FTA", "FT%", "ORB", "DRB", "TRB", "AST", "STL",
+    "BLK", "TOV", "PF", "PTS"
+]
+# columns of the table on a game log page
+TEAM_GAMES_COLS = [
+    "G", "Date", "Start (ET)", "", "", "", "Opponent", "", "", "Tm", "Opp",
+    "W", "L", "Streak", "Notes"
+]
+# number of filler tables per page (bbref pages hold many tables besides the
+# one we need)
+FILLER_TABLES = 12
+
+
+def _table(table_id, header, rows, repeat_header=None):
+    """
+    Returns an HTML table in bbref's layout. If 'repeat_header' is given, the
+    header is repeated within the body after every 'repeat_header' rows.
+    """
+    head = "".join(f'<th scope="col">{name}</th>' for name in header)
+    body = []
+    for i, row in enumerate(rows):
+        if repeat_header and i and i % repeat_header == 0:
+            body.append(f'<tr class="thead">{head}</tr>')
+        cells = "".join(f"<td>{value}</td>" for value in row[1:])
+        body.append(f'<tr><th scope="row">{row[0]}</th>{cells}</tr>')
+    return (
+        f'<table class="sortable stats_table" id="{table_id}">'
+        f"<thead><tr>{head}</tr></thead><tbody>{''.join(body)}</tbody></table>"
+    )
+
+
+def _filler(rng):
+    """
+    Returns tables and scripts of the kind that surround the required table
+    on bbref pages.
+    """
+    tables = []
+    for i in range(FILLER_TABLES):
+        rows = [[rng.randint(0, 999) for _ in range(10)] for _ in range(30)]
+        tables.append(_table(f"filler_{i}", [f"C{j}" for j in range(10)], rows))
+    script = "<script>var data = [" + ",".join(str(rng.random()) for _ in range(2000)) + "];</script>"
+    return script + "".join(tables)
+
+
+def _page(title, table, rng):
+    # bbref hides most tables in HTML comments; put the required one in the
+    # middle of the page
+    filler = _filler(rng)
+    half = len(filler) // 2
+    return (
+        f"<html><head><title>{title}</title></head><body>"
+        f"{filler[:half]}<!--\n{table}\n-->{filler[half:]}</body></html>"
+    )
+
+
+def season_stats_page(season):
+    """
+    Generates a league page listing the per-game statistics of all teams that
+    played in 'season'.
+
+    Args:
+        season (int): The season
+
+    Returns:
+        :return HTML of the page (str)
+    """
+    rng = random.Random(season)
+    rows = []
+    for rank, team in enumerate(franchises.teams(season), start=1):
+        fg, fga = rng.uniform(30, 45), rng.uniform(80, 95)
+        three, three_a = rng.uniform(5, 15), rng.uniform(15, 40)
+        ft, fta = rng.uniform(12, 22), rng.uniform(18, 28)
+        orb, drb = rng.uniform(8, 14), rng.uniform(28, 36)
+        # teams that made the playoffs are marked with an asterisk
+        name = franchises.name(team, season).title() + ("*" if rng.random() < 0.5 else "")
+        rows.append([
+            rank, name, 82, 241.2, f"{fg:.1f}", f"{fga:.1f}", f"{fg/fga:.3f}",
+            f"{three:.1f}", f"{three_a:.1f}", f"{three/three_a:.3f}",
+            f"{fg-three:.1f}", f"{fga-three_a:.1f}", f"{(fg-three)/(fga-three_a):.3f}",
+            f"{ft:.1f}", f"{fta:.1f}", f"{ft/fta:.3f}", f"{orb:.1f}", f"{drb:.1f}",
+            f"{orb+drb:.1f}", f"{rng.uniform(18, 30):.1f}", f"{rng.uniform(6, 10):.1f}",
+            f"{rng.uniform(3, 7):.1f}", f"{rng.uniform(11, 17):.1f}",
+            f"{rng.uniform(17, 23):.1f}", f"{2*fg+three+ft:.1f}"
+        ])
+    rows.append(["", "League Average"] + [""] * (len(SEASON_STATS_COLS) - 2))
+    table = _table("per_game-team", SEASON_STATS_COLS, rows)
+    return _page(f"{season} NBA Season Summary", table, rng)
+
+
+def team_games_page(team, season, n_games=82):
+    """
+    Generates the game log page of 'team' in 'season'.
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The season
+        n_games (int): Number of games
+
+    Returns:
+        :return HTML of the page (str)
+    """
+    rng = random.Random(f"{team}{season}")
+    rows = []
+    wins = losses = 0
+    for game in range(1, n_games + 1):
+        tm, opp = rng.randint(85, 130), rng.randint(85, 130)
+        if tm == opp:
+            tm += 1
+        wins += tm > opp
+        losses += tm < opp
+        rows.append([
+            game, f"Game {game}, {season}", "7:30p", "", "Box Score",
+            "@" if game % 2 else "", "Opponent", "W" if tm > opp else "L", "",
+            tm, opp, wins, losses, "", ""
+        ])
+    table = _table("games", TEAM_GAMES_COLS, rows, repeat_header=20)
+    return _page(f"{team} {season} Schedule and Results", table, rng)
+
+
+def load_page(url, page, pages_dir=None):
+    """
+    Returns the recorded page under 'url' if it has been recorded to
+    'pages_dir', and generates it by calling 'page' otherwise.
+    """
+    if pages_dir is not None:
+        path = os.path.join(pages_dir, transports.page_file_name(url))
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+    return page()
+
+
+def seed(teams, seasons, pages_dir=None):
+    """
+    Puts the league pages of 'seasons' and the game log pages of 'teams' in
+    all of 'seasons' into the run store.
+
+    Args:
+        teams (list): Abbreviations bbref uses for the teams (teams that did
+                      not play in a season are skipped)
+        seasons (iterable): The seasons
+        pages_dir (str): Directory of recorded pages (optional)
+
+    Returns:
+        :return Number of pages seeded (int)
+    """
+    n_pages = 0
+    for season in seasons:
+        url = utils.season_stats_url(season)
+        cache.store(("html", url), load_page(url, lambda: season_stats_page(season), pages_dir))
+        n_pages += 1
+        for team in teams:
+            if team not in franchises.teams(season):
+                continue
+            url = utils.team_games_url(team, season)
+            cache.store(("html", url), load_page(url, lambda: team_games_page(team, season), pages_dir))
+            n_pages += 1
+    return n_pages
+
+
+def reset(keep_pages=True):
+    """
+    Removes the parsed tables (and, unless 'keep_pages', the pages) from the
+    run store, so that the next run parses the pages again.
+
+    Args:
+        keep_pages (bool): Whether to keep the seeded pages
+
+    Returns:
+        :return None
+    """
+    cache.clear_run_store([key for key in cache.stored_keys() if not (keep_pages and key[0] == "html")])
+
+
+def go_offline(pages_dir=None):
+    """
+    Replays the recorded pages instead of downloading pages, so that a
+    benchmark cannot accidentally measure (or burden) bbref. Pages that are
+    neither seeded nor recorded cannot be fetched.
+
+    Args:
+        pages_dir (str): Directory of recorded pages (optional)
+
+    Returns:
+        :return None
+    """
+    fetching.set_transport(transports.ReplayTransport(pages_dir))
+
+
+def generate_page(url):
+    """
+    Generates the page under 'url' (a league or game log page on bbref), f.
+    ex. for a transports.StandInServer.
+
+    Args:
+        url (str): URL of the page
+
+    Returns:
+        :return HTML of the page (str), or None if it is no such page
+    """
+    name = transports.page_file_name(url)[:-len(".html")]
+    parts = name.split("_")
+    try:
+        if len(parts) == 2 and parts[0] in ("NBA", "BAA"):
+            return season_stats_page(int(parts[1]))
+        if len(parts) == 3 and parts[2] == "games":
+            return team_games_page(parts[0], int(parts[1]))
+    except ValueError:
+        pass
+    return None
+
+
+def record(pages_dir, season, teams):
+    """
+    Fetches the league page of 'season' and the game log pages of 'teams' from
+    bbref (or the page cache) and saves them to 'pages_dir'.
+
+    Args:
+        pages_dir (str): Directory to save the pages to
+        season (int): The season
+        teams (list): Abbreviations bbref uses for the teams
+
+    Returns:
+        :return Paths of the saved pages (list of str)
+    """
+    os.makedirs(pages_dir, exist_ok=True)
+    urls = [utils.season_stats_url(season)] + [utils.team_games_url(team, season) for team in teams]
+    paths = []
+    for url, html in zip(urls, fetching.fetch_many([(url, season) for url in urls])):
+        path = os.path.join(pages_dir, transports.page_file_name(url))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", metavar="DIR", required=True, help="directory to save the pages to")
+    parser.add_argument("--season", type=int, default=2022, help="season of the pages")
+    parser.add_argument("--teams", default="", help="comma-separated teams whose game logs to record")
+    args = parser.parse_args()
+
+    teams = [franchises.resolve(team.strip(), args.season) for team in args.teams.split(",") if team.strip()]
+    if None in teams:
+        parser.error(f"unknown team in '{args.teams}' for season {args.season-1}/{args.season}")
+    for path in record(args.record, args.season, teams):
+        print(path)
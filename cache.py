@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import zlib
+import sqlite3
+import datetime
+import threading
+from contextlib import closing
+from concurrent.futures import Future
+
+
+# directory in which the page cache is stored (can be redirected by setting the
+# environment variable BBREF_CACHE_DIR)
+CACHE_DIR = os.environ.get(
+    "BBREF_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "bbref")
+)
+CACHE_FILE = "pages.sqlite"
+# upper bound for the summed size of all (compressed) cached pages in bytes
+MAX_BYTES = 256 * 1024 * 1024
+# pages of completed seasons never change, pages of the running season do
+TTL_FINISHED = 365 * 24 * 60 * 60
+TTL_CURRENT = 6 * 60 * 60
+# upper bound for the summed size of the objects built by remember() in bytes
+# (see _trim())
+RUN_STORE_BYTES = 128 * 1024 * 1024
+
+# counters for cache hits, misses and evictions since the start of the run
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+# pages and parsed tables that have already been obtained during this run
+run_store = {}
+# objects of the run store that are being built at the moment (by another
+# thread, f. ex. the prefetcher), so that they are not built twice
+_pending = {}
+_run_lock = threading.Lock()
+# sizes of the objects built by remember() (oldest first), and their sum
+_sizes = {}
+_used = 0
+# stands in for a missing object (None may be stored)
+_MISSING = object()
+
+
+def current_season():
+    """
+    Returns the ending year of the season that is currently running (or that
+    is about to start). NBA seasons start in October, so from October on the
+    season ending in the following year is the current one.
+
+    Returns:
+        :return Ending year of the current season (int)
+    """
+    today = datetime.date.today()
+    return today.year + 1 if today.month >= 10 else today.year
+
+
+def ttl(season):
+    """
+    Returns how long a page belonging to 'season' may be served from the cache.
+
+    Args:
+        season (int): The season the page belongs to
+
+    Returns:
+        :return Time to live in seconds
+    """
+    return TTL_FINISHED if season < current_season() else TTL_CURRENT
+
+
+def _connect():
+    """
+    Opens a connection to the cache database, creating the database and its
+    table if necessary. A new connection is opened for every access, so that
+    the cache can be used from several threads.
+
+    Returns:
+        :return sqlite3 Connection
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(CACHE_DIR, CACHE_FILE), timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires REAL NOT NULL,
+            last_access REAL NOT NULL
+        )"""
+    )
+    return conn
+
+
+def _count(counter):
+    with _lock:
+        stats[counter] += 1
+
+
+def get(url):
+    """
+    Looks up the page stored under 'url'. Expired pages count as misses.
+
+    Args:
+        url (str): URL of the page
+
+    Returns:
+        :return HTML of the page (str), or None if it is not cached (anymore)
+    """
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        row = conn.execute(
+            "SELECT body, expires FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None or row[1] < now:
+            _count("misses")
+            return None
+        # remember the access for the LRU eviction
+        conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (now, url))
+    _count("hits")
+    return zlib.decompress(row[0]).decode("utf-8")
+
+
+def put(url, html, season):
+    """
+    Stores the page compressed under 'url' and evicts the least recently used
+    pages if the cache exceeds MAX_BYTES.
+
+    Args:
+        url (str): URL of the page
+        html (str): HTML of the page
+        season (int): The season the page belongs to (determines the TTL)
+
+    Returns:
+        :return None
+    """
+    now = time.time()
+    body = zlib.compress(html.encode("utf-8"), 6)
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (url, body, len(body), now + ttl(season), now)
+        )
+        _evict(conn)
+
+
+def _evict(conn):
+    """
+    Deletes least recently used pages until the cache fits into MAX_BYTES.
+
+    Args:
+        conn (sqlite3 Connection): Open connection to the cache database
+
+    Returns:
+        :return None
+    """
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    for url, size in conn.execute(
+        "SELECT url, size FROM pages ORDER BY last_access ASC"
+    ).fetchall():
+        conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+        _count("evictions")
+        total -= size
+        if total <= MAX_BYTES:
+            break
+
+
+def clear():
+    """
+    Removes all pages from the cache.
+
+    Returns:
+        :return None
+    """
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM pages")
+
+
+def remember(key, build):
+    """
+    Returns the object stored under 'key' in the run store. If there is none
+    yet, it is built by calling 'build' and stored, so that every page is
+    requested and parsed only once per run. If another thread is building the
+    object at the moment, this waits for it instead of building it again.
+    Should the built objects exceed RUN_STORE_BYTES, the oldest are dropped
+    (see _trim()).
+
+    Args:
+        key (tuple): Identifies the object, f. ex. ("html", url)
+        build (function): Called without arguments to obtain the object
+
+    Returns:
+        :return The stored object
+    """
+    # (_trim() may drop the object on another thread at any time, so it is
+    # looked up only once)
+    obj = run_store.get(key, _MISSING)
+    if obj is not _MISSING:
+        return obj
+    with _run_lock:
+        obj = run_store.get(key, _MISSING)
+        if obj is not _MISSING:
+            return obj
+        future = _pending.get(key)
+        owner = future is None
+        if owner:
+            future = _pending[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        obj = build()
+    except Exception as error:
+        # nothing is stored, so the next call tries again
+        future.set_exception(error)
+        raise
+    else:
+        store(key, obj)
+        future.set_result(obj)
+        return obj
+    finally:
+        with _run_lock:
+            del _pending[key]
+
+
+def store(key, obj):
+    """
+    Stores 'obj' under 'key' in the run store, replacing the object stored
+    there before (f. ex. a page that has been downloaded again). It is
+    accounted for like the objects built by remember(), so the oldest objects
+    are dropped if the run store exceeds RUN_STORE_BYTES (see _trim()).
+
+    Args:
+        key (tuple): Identifies the object, f. ex. ("html", url)
+        obj: The object
+
+    Returns:
+        :return None
+    """
+    global _used
+    size = _size(obj)
+    with _run_lock:
+        # (stored again as the newest object)
+        _used -= _sizes.pop(key, 0)
+        run_store[key] = obj
+        _sizes[key] = size
+        _trim(key, size)
+
+
+def discard(key):
+    """
+    Removes the object stored under 'key' from the run store (if there is
+    one), f. ex. a parsed table that is outdated.
+
+    Args:
+        key (tuple): Identifies the object
+
+    Returns:
+        :return None
+    """
+    global _used
+    with _run_lock:
+        _used -= _sizes.pop(key, 0)
+        run_store.pop(key, None)
+
+
+def stored_keys():
+    """
+    Returns the keys of all objects in the run store (set).
+    """
+    with _run_lock:
+        return set(run_store)
+
+
+def clear_run_store(keys=None):
+    """
+    Removes the objects stored under 'keys' from the run store, f. ex. those
+    a season has added, or all objects if no keys are given.
+
+    Args:
+        keys (iterable): Keys of the objects to remove (optional)
+
+    Returns:
+        :return None
+    """
+    global _used
+    with _run_lock:
+        if keys is None:
+            run_store.clear()
+            _sizes.clear()
+            _used = 0
+            return
+        for key in keys:
+            _used -= _sizes.pop(key, 0)
+            run_store.pop(key, None)
+
+
+def _size(obj):
+    """
+    Estimates the memory used by 'obj' (a page or a parsed table) in bytes.
+    """
+    if hasattr(obj, "memory_usage"):   # pandas DataFrame
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    return sys.getsizeof(obj)
+
+
+def _trim(key, size):
+    """
+    Accounts for the object just stored under 'key' and, if the objects built
+    by remember() exceed RUN_STORE_BYTES, drops the oldest of them from the
+    run store until they fit again. Pages are dropped first, as the tables
+    parsed from them are usually stored already; a dropped object is simply
+    built again if it is needed again (pages come from the page cache then).
+    Must be called with _run_lock held.
+    """
+    global _used
+    _used += size
+    for pages_only in (True, False):
+        for old in list(_sizes):
+            if _used <= RUN_STORE_BYTES:
+                return
+            if old == key or (pages_only and old[0] != "html"):
+                continue
+            _used -= _sizes.pop(old)
+            run_store.pop(old, None)
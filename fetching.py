@@ -0,0 +1,224 @@
+import os
+import time
+import cache
+import threading
+import profiling
+import transports
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+
+# number of pages that are downloaded at the same time by fetch_many()
+MAX_WORKERS = 4
+# bbref blocks clients that send more than 20 requests per minute
+REQUESTS_PER_MINUTE = 20
+# HTTP status codes after which a download is retried, how often, and how long
+# to wait before the first retry (doubled for each further retry)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+BACKOFF = 2.0
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by all threads that download pages. Tokens are refilled
+    continuously at 'rate' tokens per second up to 'capacity' tokens, and every
+    request consumes one token.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available and consumes it.
+
+        Returns:
+            :return None
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.last_refill) * self.rate
+                )
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_bucket = TokenBucket(REQUESTS_PER_MINUTE / 60, REQUESTS_PER_MINUTE)
+# backend all downloads go through (created on first use, see get_transport())
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def set_rate_limit(requests_per_minute, burst=None):
+    """
+    Replaces the rate limiter used for all downloads.
+
+    Args:
+        requests_per_minute (float): Number of requests allowed per minute
+        burst (int): Number of requests that may be sent at once before the
+                     limit applies (defaults to 'requests_per_minute')
+
+    Returns:
+        :return None
+    """
+    global _bucket
+    _bucket = TokenBucket(
+        requests_per_minute / 60,
+        burst if burst is not None else requests_per_minute
+    )
+
+
+def set_transport(transport):
+    """
+    Replaces the backend all downloads go through, f. ex. by a
+    transports.ReplayTransport to run the program on saved pages.
+
+    Args:
+        transport: A transport from transports.py
+
+    Returns:
+        :return None
+    """
+    global _transport
+    _transport = transport
+
+
+def get_transport():
+    """
+    Returns the backend all downloads go through. Unless one has been set via
+    set_transport(), it is chosen by environment variables: pages are
+    replayed from the directory BBREF_REPLAY_DIR if that is set, requested
+    from the server BBREF_BASE_URL (f. ex. a transports.StandInServer) if
+    that is set, and downloaded from bbref otherwise.
+
+    Returns:
+        :return The transport
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            if os.environ.get("BBREF_REPLAY_DIR"):
+                _transport = transports.ReplayTransport(os.environ["BBREF_REPLAY_DIR"])
+            else:
+                _transport = transports.LiveTransport(os.environ.get("BBREF_BASE_URL"), pool_size=MAX_WORKERS)
+        return _transport
+
+
+def fetch_html(url, season):
+    """
+    Returns the HTML of the bbref page under 'url'. Within a run, every page
+    is obtained only once. It is taken from the persistent page cache if
+    possible, and downloaded (and then cached) otherwise.
+
+    Args:
+        url (str): URL of the page
+        season (int): The season the page belongs to (determines how long the
+                      page is cached)
+
+    Returns:
+        :return HTML of the page (str)
+    """
+    return cache.remember(("html", url), lambda: _load_html(url, season))
+
+
+def refresh_html(url, season):
+    """
+    Downloads the page under 'url' regardless of whether it has been obtained
+    before, and replaces it in the page cache and the run store.
+
+    Args:
+        url (str): URL of the page
+        season (int): The season the page belongs to
+
+    Returns:
+        :return HTML of the page (str)
+    """
+    html = _download(url)
+    if get_transport().live:
+        cache.put(url, html, season)
+    cache.store(("html", url), html)
+    return html
+
+
+def fetch_many(pages, max_workers=MAX_WORKERS, return_exceptions=False):
+    """
+    Fetches several pages concurrently via fetch_html(). The rate limit and
+    the retries of _download() apply to every single download.
+
+    Args:
+        pages (list): (url, season) tuples of the pages to fetch
+        max_workers (int): Maximum number of pages downloaded at the same time
+        return_exceptions (bool): If True, a page that cannot be fetched is
+                                  represented by the exception raised for it;
+                                  if False, the first exception is re-raised
+
+    Returns:
+        :return HTML of the pages (list of str) in the same order as 'pages'
+    """
+    fetch = _fetch_or_exception if return_exceptions else lambda page: fetch_html(*page)
+    if len(pages) <= 1:
+        return [fetch(page) for page in pages]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map() yields the results in the order of 'pages' and re-raises the
+        # first exception that occurred
+        return list(executor.map(fetch, pages))
+
+
+def _fetch_or_exception(page):
+    try:
+        return fetch_html(*page)
+    except Exception as error:
+        return error
+
+
+def _load_html(url, season):
+    if not get_transport().live:
+        # replayed or stand-in pages never enter the page cache
+        return _download(url)
+    html = cache.get(url)
+    if html is None:
+        html = _download(url)
+        cache.put(url, html, season)
+    return html
+
+
+def _download(url):
+    """
+    Downloads the page under 'url' via the current transport, respecting the
+    rate limit if the page is downloaded from bbref. Requests that fail with
+    one of the RETRY_STATUSES are retried with exponential backoff, or after
+    the time the server asks for in its Retry-After header.
+
+    Args:
+        url (str): URL of the page
+
+    Returns:
+        :return HTML of the page (str)
+    """
+    transport = get_transport()
+    for attempt in range(MAX_RETRIES + 1):
+        if transport.live:
+            _bucket.acquire()
+        try:
+            with profiling.span("http", url=url):
+                return transport.get(url)
+        except urllib.error.HTTPError as error:
+            if error.code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                raise
+            delay = BACKOFF * 2 ** attempt
+            retry_after = error.headers.get("Retry-After") if error.headers else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+        time.sleep(delay)
@@ -0,0 +1,273 @@
+import cache
+
+
+# All teams that ever played in the BAA/NBA, as
+#   (name, abbreviation bbref uses, first season, last season, franchise,
+#    other abbreviations the team is commonly known by)
+# Seasons are given by their ending year, a last season of None means that the
+# team is still active. The franchise is the abbreviation of the franchise's
+# current (or last) team, so that f. ex. the Seattle SuperSonics and the
+# Oklahoma City Thunder belong to the same franchise.
+# Based on
+# https://github.com/sherpan/bbref_team_game_logs/blob/master/README.md
+# with the abbreviations corrected to the ones bbref uses in its URLs.
+TEAMS = (
+    ("TRI-CITIES BLACKHAWKS", "TRI", 1950, 1951, "ATL", ()),
+    ("MILWAUKEE HAWKS", "MLH", 1952, 1955, "ATL", ("MIL",)),
+    ("ST. LOUIS HAWKS", "STL", 1956, 1968, "ATL", ("SLH",)),
+    ("ATLANTA HAWKS", "ATL", 1969, None, "ATL", ()),
+    ("BOSTON CELTICS", "BOS", 1947, None, "BOS", ()),
+    ("NEW YORK NETS", "NYN", 1977, 1977, "BRK", ()),
+    ("NEW JERSEY NETS", "NJN", 1978, 2012, "BRK", ()),
+    ("BROOKLYN NETS", "BRK", 2013, None, "BRK", ()),
+    ("CHARLOTTE HORNETS", "CHH", 1989, 2002, "CHO", ("CHO",)),
+    ("CHARLOTTE BOBCATS", "CHA", 2005, 2014, "CHO", ()),
+    ("CHARLOTTE HORNETS", "CHO", 2015, None, "CHO", ()),
+    ("CHICAGO BULLS", "CHI", 1967, None, "CHI", ()),
+    ("CLEVELAND CAVALIERS", "CLE", 1971, None, "CLE", ()),
+    ("DALLAS MAVERICKS", "DAL", 1981, None, "DAL", ()),
+    ("DENVER NUGGETS", "DEN", 1977, None, "DEN", ()),
+    ("FORT WAYNE PISTONS", "FTW", 1949, 1957, "DET", ("FWP",)),
+    ("DETROIT PISTONS", "DET", 1958, None, "DET", ()),
+    ("PHILADELPHIA WARRIORS", "PHW", 1947, 1962, "GSW", ()),
+    ("SAN FRANCISCO WARRIORS", "SFW", 1963, 1971, "GSW", ()),
+    ("GOLDEN STATE WARRIORS", "GSW", 1972, None, "GSW", ()),
+    ("SAN DIEGO ROCKETS", "SDR", 1968, 1971, "HOU", ()),
+    ("HOUSTON ROCKETS", "HOU", 1972, None, "HOU", ()),
+    ("INDIANA PACERS", "IND", 1977, None, "IND", ()),
+    ("BUFFALO BRAVES", "BUF", 1971, 1978, "LAC", ()),
+    ("SAN DIEGO CLIPPERS", "SDC", 1979, 1984, "LAC", ()),
+    ("LOS ANGELES CLIPPERS", "LAC", 1985, None, "LAC", ()),
+    ("MINNEAPOLIS LAKERS", "MNL", 1949, 1960, "LAL", ("MIN",)),
+    ("LOS ANGELES LAKERS", "LAL", 1961, None, "LAL", ()),
+    ("VANCOUVER GRIZZLIES", "VAN", 1996, 2001, "MEM", ()),
+    ("MEMPHIS GRIZZLIES", "MEM", 2002, None, "MEM", ()),
+    ("MIAMI HEAT", "MIA", 1989, None, "MIA", ()),
+    ("MILWAUKEE BUCKS", "MIL", 1969, None, "MIL", ()),
+    ("MINNESOTA TIMBERWOLVES", "MIN", 1990, None, "MIN", ()),
+    ("NEW ORLEANS HORNETS", "NOH", 2003, 2005, "NOP", ()),
+    ("NEW ORLEANS/OKLAHOMA CITY HORNETS", "NOK", 2006, 2007, "NOP", ()),
+    ("NEW ORLEANS HORNETS", "NOH", 2008, 2013, "NOP", ()),
+    ("NEW ORLEANS PELICANS", "NOP", 2014, None, "NOP", ()),
+    ("NEW YORK KNICKS", "NYK", 1947, None, "NYK", ()),
+    ("SEATTLE SUPERSONICS", "SEA", 1968, 2008, "OKC", ()),
+    ("OKLAHOMA CITY THUNDER", "OKC", 2009, None, "OKC", ()),
+    ("ORLANDO MAGIC", "ORL", 1990, None, "ORL", ()),
+    ("SYRACUSE NATIONALS", "SYR", 1950, 1963, "PHI", ()),
+    ("PHILADELPHIA 76ERS", "PHI", 1964, None, "PHI", ()),
+    ("PHOENIX SUNS", "PHO", 1969, None, "PHO", ()),
+    ("PORTLAND TRAIL BLAZERS", "POR", 1971, None, "POR", ()),
+    ("ROCHESTER ROYALS", "ROC", 1949, 1957, "SAC", ("ROR",)),
+    ("CINCINNATI ROYALS", "CIN", 1958, 1972, "SAC", ()),
+    ("KANSAS CITY-OMAHA KINGS", "KCO", 1973, 1975, "SAC", ("KCK",)),
+    ("KANSAS CITY KINGS", "KCK", 1976, 1985, "SAC", ()),
+    ("SACRAMENTO KINGS", "SAC", 1986, None, "SAC", ()),
+    ("SAN ANTONIO SPURS", "SAS", 1977, None, "SAS", ()),
+    ("TORONTO RAPTORS", "TOR", 1996, None, "TOR", ()),
+    ("NEW ORLEANS JAZZ", "NOJ", 1975, 1979, "UTA", ()),
+    ("UTAH JAZZ", "UTA", 1980, None, "UTA", ()),
+    ("CHICAGO PACKERS", "CHP", 1962, 1962, "WAS", ("CHI",)),
+    ("CHICAGO ZEPHYRS", "CHZ", 1963, 1963, "WAS", ("CHI",)),
+    ("BALTIMORE BULLETS", "BAL", 1964, 1973, "WAS", ()),
+    ("CAPITAL BULLETS", "CAP", 1974, 1974, "WAS", ()),
+    ("WASHINGTON BULLETS", "WSB", 1975, 1997, "WAS", ("WAS",)),
+    ("WASHINGTON WIZARDS", "WAS", 1998, None, "WAS", ()),
+    # defunct franchises
+    ("ANDERSON PACKERS", "AND", 1950, 1950, "AND", ()),
+    ("BALTIMORE BULLETS", "BLB", 1948, 1955, "BLB", ("BAL",)),
+    ("CHICAGO STAGS", "CHS", 1947, 1950, "CHS", ()),
+    ("CLEVELAND REBELS", "CLR", 1947, 1947, "CLR", ()),
+    ("DENVER NUGGETS", "DNN", 1950, 1950, "DNN", ("DEN",)),
+    ("DETROIT FALCONS", "DTF", 1947, 1947, "DTF", ()),
+    ("INDIANAPOLIS JETS", "INJ", 1949, 1949, "INJ", ()),
+    ("INDIANAPOLIS OLYMPIANS", "INO", 1950, 1953, "INO", ("IND",)),
+    ("PITTSBURGH IRONMEN", "PIT", 1947, 1947, "PIT", ()),
+    ("PROVIDENCE STEAMROLLERS", "PRO", 1947, 1949, "PRO", ()),
+    ("SHEBOYGAN RED SKINS", "SHE", 1950, 1950, "SHE", ("SRS",)),
+    ("ST. LOUIS BOMBERS", "STB", 1947, 1950, "STB", ()),
+    ("TORONTO HUSKIES", "TRH", 1947, 1947, "TRH", ()),
+    ("WASHINGTON CAPITOLS", "WSC", 1947, 1951, "WSC", ("WAS",)),
+    ("WATERLOO HAWKS", "WAT", 1950, 1950, "WAT", ()),
+)
+
+
+def _compile():
+    """
+    Compiles TEAMS into the lookup tables used by the functions below. Names
+    and bbref abbreviations take precedence over the other abbreviations, so
+    that f. ex. "WAS" in 1990 still refers to the Washington Bullets, but "WAS"
+    in 2000 to the Washington Wizards.
+
+    Returns:
+        :return Dictionaries (name or abbreviation, season) -> bbref
+                abbreviation, (bbref abbreviation, season) -> (name,
+                franchise), and season -> list of bbref abbreviations
+    """
+    last_season = cache.current_season()
+    codes = {}
+    teams = {}
+    seasons = {}
+    for name, code, first, last, franchise, _ in TEAMS:
+        for season in range(first, (last or last_season) + 1):
+            codes[(name, season)] = code
+            codes[(code, season)] = code
+            teams[(code, season)] = (name, franchise)
+            seasons.setdefault(season, []).append(code)
+    for _, code, first, last, _, aliases in TEAMS:
+        for season in range(first, (last or last_season) + 1):
+            for alias in aliases:
+                codes.setdefault((alias, season), code)
+    return codes, teams, seasons
+
+
+# compiled once at import
+_codes, _teams, _seasons = _compile()
+# all names and abbreviations regardless of season
+_known = {key for key, _ in _codes}
+
+
+def resolve(team, season):
+    """
+    Returns the abbreviation bbref uses for 'team' in 'season'.
+
+    Args:
+        team (str): Name or abbreviation of the team (case insensitive)
+        season (int): The queried season
+
+    Returns:
+        :return Abbreviation (str), or None if no such team played in 'season'
+    """
+    return _codes.get((team.upper(), season))
+
+
+def is_known(team):
+    """
+    Checks whether 'team' is the name or an abbreviation of any team in any
+    season.
+
+    Args:
+        team (str): Name or abbreviation of the team (case insensitive)
+
+    Returns:
+        :return True or False
+    """
+    return team.upper() in _known
+
+
+def name(code, season):
+    """
+    Returns the full name of the team with the bbref abbreviation 'code' in
+    'season'.
+
+    Args:
+        code (str): Abbreviation bbref uses for the team
+        season (int): The queried season
+
+    Returns:
+        :return Name of the team in all caps (str)
+    """
+    return _teams[(code, season)][0]
+
+
+def franchise(code, season):
+    """
+    Returns the franchise the team with the bbref abbreviation 'code' in
+    'season' belongs to.
+
+    Args:
+        code (str): Abbreviation bbref uses for the team
+        season (int): The queried season
+
+    Returns:
+        :return Abbreviation of the franchise (str)
+    """
+    return _teams[(code, season)][1]
+
+
+def teams(season):
+    """
+    Returns the bbref abbreviations of all teams that played in 'season'.
+
+    Args:
+        season (int): The queried season
+
+    Returns:
+        :return List of abbreviations
+    """
+    return list(_seasons.get(season, []))
+
+
+def resolve_franchise(team, seasons):
+    """
+    Returns the franchise of 'team', which may be given by the name or an
+    abbreviation of any team of the franchise that played in one of 'seasons'.
+    Used for queries that span several seasons, during which a team may have
+    been renamed or relocated.
+
+    Args:
+        team (str): Name or abbreviation of the team (case insensitive)
+        seasons (range): The queried seasons
+
+    Returns:
+        :return Abbreviation of the franchise (str), or None if no such team
+                played in any of 'seasons'
+    """
+    # the latest season in which 'team' refers to a team takes precedence
+    for season in reversed(seasons):
+        code = resolve(team, season)
+        if code is not None:
+            return franchise(code, season)
+    return None
+
+
+def code(franchise, season):
+    """
+    Returns the bbref abbreviation of the team of 'franchise' in 'season'.
+
+    Args:
+        franchise (str): Abbreviation of the franchise
+        season (int): The queried season
+
+    Returns:
+        :return Abbreviation (str), or None if the franchise did not play in
+                'season'
+    """
+    for team in _seasons.get(season, []):
+        if _teams[(team, season)][1] == franchise:
+            return team
+    return None
+
+
+def franchise_name(franchise):
+    """
+    Returns the name of the latest team of 'franchise'.
+
+    Args:
+        franchise (str): Abbreviation of the franchise
+
+    Returns:
+        :return Name of the team in all caps (str)
+    """
+    latest = max(
+        (entry for entry in TEAMS if entry[4] == franchise),
+        key=lambda entry: entry[3] or cache.current_season()
+    )
+    return latest[0]
+
+
+def all_teams(season):
+    """
+    Returns all teams that played in 'season', or all franchises that played
+    in any of the seasons if 'season' is a span of seasons.
+
+    Args:
+        season (int or range): The queried season(s)
+
+    Returns:
+        :return List of bbref abbreviations (or franchise abbreviations)
+    """
+    if isinstance(season, range):
+        return list(dict.fromkeys(
+            franchise(team, s) for s in season for team in teams(s)
+        ))
+    return teams(season)
@@ -0,0 +1,52 @@
+import sys
+import types
+import importlib
+import importlib.util
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Stands in for a module that has not been imported yet. The module is
+    imported when the first of its attributes is accessed; from then on, its
+    attributes are looked up directly.
+    """
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        # copy the attributes, so that further lookups do not end up here
+        # (submodules imported later are still found via the line below)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def module(name):
+    """
+    Returns the module 'name' without importing it yet: it is imported at the
+    first access to one of its attributes. Used for the heavy dependencies
+    (pandas, scipy, matplotlib), so that they are only imported when they are
+    actually needed, f. ex. scipy only for margins and matplotlib only when a
+    plot is rendered.
+
+    Args:
+        name (str): Name of the module, f. ex. "scipy.ndimage"
+
+    Returns:
+        :return The module (if it has been imported already), or a stand-in
+                for it
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
+
+
+def available(name):
+    """
+    Checks whether the module 'name' is installed, without importing it.
+
+    Args:
+        name (str): Name of a top-level module, f. ex. "pyarrow"
+
+    Returns:
+        :return True or False
+    """
+    return importlib.util.find_spec(name) is not None
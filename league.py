@@ -0,0 +1,184 @@
+"""
+League distributions of the per-game statistics: where does a team stand in
+the league? For every season, the statistics of all teams are sorted once
+(per stat), so that the percentile and the rank of any value are found by a
+binary search (O(log n)) instead of a scan over the whole table. The index of
+a season is built from the full table (sourcing.get_season_stats() only keeps
+the queried teams) and kept in the run store.
+"""
+import lazy
+import cache
+import utils
+import warehouse
+
+np = lazy.module("numpy")
+
+
+# quantiles that are precomputed for every stat, used for the league median
+# and the percentile bands in the plots
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class SeasonIndex:
+    """
+    Sorted values, quantiles and ranks of all stats of all teams in a season.
+    Ranks are given in descending order, i.e. the team with the most points
+    (or turnovers) ranks first; equal values share a rank.
+    """
+
+    def __init__(self, table):
+        """
+        Args:
+            table (DataFrame): Season statistics of all teams, indexed by the
+                               abbreviations of the teams
+        """
+        table = table.select_dtypes("number").drop(columns=["Rk", "G"], errors="ignore")
+        self.teams = list(table.index)
+        self.stats = list(table.columns)
+        self._rows = {team: i for i, team in enumerate(self.teams)}
+        self._cols = {stat: j for j, stat in enumerate(self.stats)}
+        self._values = table.to_numpy(dtype=float, na_value=np.nan)
+
+        self._sorted = []
+        self._quantiles = np.full((len(self.stats), len(QUANTILES)), np.nan)
+        self._ranks = np.full(self._values.shape, np.nan)
+        for j, col in enumerate(self._values.T):
+            valid = np.isfinite(col)
+            values = np.sort(col[valid])
+            self._sorted.append(values)
+            if values.size:
+                self._quantiles[j] = np.quantile(values, QUANTILES)
+                self._ranks[valid, j] = values.size - np.searchsorted(values, col[valid], side="right") + 1
+
+    def _stat(self, stat):
+        if stat not in self._cols:
+            raise KeyError(f"No league statistics for '{stat}'")
+        return self._cols[stat]
+
+    def value(self, team, stat):
+        """
+        Returns the value of 'stat' of 'team' (NaN if it is missing).
+        """
+        return self._values[self._rows[team], self._stat(stat)]
+
+    def percentile(self, stat, value):
+        """
+        Returns the percentile rank of 'value' among the values of 'stat' of
+        all teams: the share of teams with a lower value, counting teams with
+        the same value half (0-100, NaN if there are no values).
+        """
+        values = self._sorted[self._stat(stat)]
+        if not values.size or not np.isfinite(value):
+            return np.nan
+        below = np.searchsorted(values, value, side="left")
+        equal = np.searchsorted(values, value, side="right") - below
+        return 100 * (below + equal / 2) / values.size
+
+    def rank(self, stat, value):
+        """
+        Returns the rank 'value' would have among the values of 'stat' of all
+        teams (1 for the highest value).
+        """
+        values = self._sorted[self._stat(stat)]
+        return int(values.size - np.searchsorted(values, value, side="right") + 1)
+
+    def team_percentile(self, team, stat):
+        """
+        Returns the percentile rank of 'team' in 'stat' (see percentile()).
+        """
+        return self.percentile(stat, self.value(team, stat))
+
+    def team_rank(self, team, stat):
+        """
+        Returns the rank of 'team' in 'stat' (NaN if its value is missing).
+        """
+        return self._ranks[self._rows[team], self._stat(stat)]
+
+    def quantiles(self, stat):
+        """
+        Returns the league quantiles QUANTILES of 'stat' (ndarray).
+        """
+        return self._quantiles[self._stat(stat)].copy()
+
+    def bands(self, stats):
+        """
+        Returns the league quantiles of 'stats' as plain dictionaries
+        {quantile: value}, which are attached to the data of a plot (see
+        sourcing.get_season_stats() and plotting.py).
+        """
+        return {stat: dict(zip(QUANTILES, self.quantiles(stat).tolist())) for stat in stats}
+
+
+def _season_table(season):
+    """
+    Returns the statistics of all teams of 'season', indexed by abbreviation.
+    """
+    if warehouse.has_season(season):
+        return warehouse.read_season_stats(season)
+    table = utils.scrape_season_stats(season)
+    table["Team"] = utils.resolve_teams(table["Team"], season)
+    # (without the league average and other rows that are no teams)
+    return table.dropna(subset=["Team"]).set_index("Team")
+
+
+def index(season):
+    """
+    Returns the league index of 'season'. It is built once per run.
+
+    Args:
+        season (int): The queried season
+
+    Returns:
+        :return SeasonIndex
+    """
+    return cache.remember(("league", season), lambda: SeasonIndex(_season_table(season)))
+
+
+def bands(table, stats):
+    """
+    Returns the league quantiles of 'stats' (see SeasonIndex.bands()) among
+    all teams in 'table'. Used when only these stats of the teams have been
+    loaded, so that the whole league index is not built for them.
+
+    Args:
+        table (DataFrame): Season statistics of all teams (at least the
+                           columns 'stats'), indexed by abbreviation
+        stats (list): Columns of the season statistics, f. ex. ["PTS"]
+
+    Returns:
+        :return Dictionary with 'stats' (keys) and dictionaries {quantile:
+                value} (values)
+    """
+    return SeasonIndex(table[list(stats)]).bands(stats)
+
+
+def percentile(team, stat, season):
+    """
+    Returns the percentile rank of 'team' in 'stat' among all teams of
+    'season' (0-100).
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        stat (str): Column of the season statistics, f. ex. "PTS"
+        season (int): The queried season
+
+    Returns:
+        :return Percentile rank (float)
+    """
+    return index(season).team_percentile(team, stat)
+
+
+def rank(team, stat, season):
+    """
+    Returns the rank of 'team' in 'stat' among all teams of 'season' (1 for
+    the highest value).
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        stat (str): Column of the season statistics, f. ex. "PTS"
+        season (int): The queried season
+
+    Returns:
+        :return Rank (float, NaN if the team has no value)
+    """
+    return index(season).team_rank(team, stat)
@@ -1,10 +1,68 @@
+import time
+import argparse
+import profiling
 import query_io
 import sourcing
-import plotting
 
 
-query = query_io.get_query()
-data, teams_updated = sourcing.get_data(query)
-query[1] = teams_updated
-plot = plotting.visualize(data, query)
-query_io.export(plot, query)
+def main(smoothings=None, clip=None):
+    query = query_io.get_query()
+    data, teams_updated = sourcing.get_data(query, smoothings=smoothings)
+    query[1] = teams_updated
+    if clip and query[0] == "mar" and not isinstance(query[2], range):
+        import animation
+        animation.animate(data, teams_updated, query[2], clip)
+        print(f"\nThe animation has been saved to {clip}.\n")
+        return
+    if clip:
+        print("\nOnly margins can be animated, the plot is exported instead.")
+    query_io.export(data, query)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Visualizing basketball statistics from basketball-reference.com.")
+    parser.add_argument("--batch", metavar="JOBFILE", help="run all jobs of a JSONL or CSV job file instead of the dialogue")
+    parser.add_argument("--processes", type=int, help="number of rendering processes in batch mode (default: number of CPU cores)")
+    parser.add_argument("--smoothing", help="comma-separated smoothings of the margins, the first of which is the main one and the others are overlaid, f. ex. gaussian:3,ewma:10 (kernels: gaussian, ewma, rolling, savgol)")
+    parser.add_argument("--bundle", metavar="FILE", help="in batch mode, write all plots into one PDF, ZIP or TAR file (by extension) instead of one PNG file per plot")
+    parser.add_argument("--animate", metavar="FILE", help="render the margins as a GIF or MP4 clip (by extension) in which they build up game by game (requires ffmpeg)")
+    parser.add_argument("--profile", action="store_true", help="record the time spent in each stage, write it to a JSON trace and print a summary")
+    args = parser.parse_args()
+
+    if args.bundle:
+        import rendering
+        if not args.batch:
+            parser.error("--bundle requires --batch")
+        if rendering.bundle_format(args.bundle) is None:
+            parser.error(f"--bundle must end in one of {', '.join('.' + fmt for fmt in rendering.BUNDLE_FORMATS)}")
+
+    if args.animate:
+        import animation
+        if args.batch:
+            parser.error("--animate cannot be combined with --batch")
+        if animation.clip_format(args.animate) is None:
+            parser.error(f"--animate must end in one of {', '.join('.' + fmt for fmt in animation.FORMATS)}")
+        if not animation.encoder_available():
+            parser.error("--animate requires ffmpeg, which could not be found")
+
+    smoothings = None
+    if args.smoothing:
+        import smoothing
+        try:
+            smoothings = [smoothing.parse(spec) for spec in args.smoothing.split(",")]
+        except ValueError as error:
+            parser.error(str(error))
+
+    if args.profile:
+        profiling.enable()
+
+    if args.batch:
+        import batch
+        batch.run_batch(args.batch, args.processes, args.bundle, smoothings)
+    else:
+        main(smoothings, args.animate)
+
+    if args.profile:
+        trace = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        profiling.write_trace(trace)
+        print(f"\n{profiling.summary()}\n\nThe trace has been written to {trace}.")
@@ -0,0 +1,174 @@
+import lazy
+from html.parser import HTMLParser
+
+pd = lazy.module("pandas")
+
+
+# ids bbref uses for the table containing the per-game statistics of all teams
+# on a league page (the id changed when bbref redesigned the page)
+SEASON_STATS_IDS = ("per_game-team", "team-stats-per_game")
+# id of the table listing all matches on a team's game log page
+TEAM_GAMES_IDS = ("games",)
+
+
+class _TableComplete(Exception):
+    """
+    Raised by _TableParser as soon as the table is complete, which stops
+    parsing the rest of the page.
+    """
+
+
+class _TableParser(HTMLParser):
+    """
+    Collects the header and the rows of the first table fed to it. Header rows
+    that bbref repeats within the table body (class "thead") are skipped.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.header = []
+        self.rows = []
+        self.section = None   # "thead", "tbody" or "tfoot"
+        self.row = None
+        self.cell = None
+        self.colspan = 1
+        self.depth = 0   # nesting depth of tables
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.depth += 1
+        elif self.depth != 1:
+            return
+        elif tag in ("thead", "tbody", "tfoot"):
+            self.section = tag
+        elif tag == "tr":
+            classes = (dict(attrs).get("class") or "").split()
+            # repeated header rows within the body are skipped, and of the
+            # header rows only the last one (the column names) is kept
+            skip = "thead" in classes and self.section != "thead"
+            self.row = None if skip else []
+        elif tag in ("th", "td") and self.row is not None:
+            self.cell = []
+            colspan = dict(attrs).get("colspan") or "1"
+            self.colspan = int(colspan) if colspan.isdigit() else 1
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "table":
+            self.depth -= 1
+            if self.depth == 0:
+                raise _TableComplete
+        elif self.depth != 1:
+            return
+        elif tag in ("th", "td") and self.cell is not None:
+            self.row.extend(["".join(self.cell).strip()] * self.colspan)
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            if self.section == "thead":
+                self.header = self.row
+            else:
+                self.rows.append(self.row)
+            self.row = None
+
+
+def _locate(html, table_ids):
+    """
+    Finds the start of the first table with one of the ids 'table_ids'. This
+    also finds tables that bbref hides inside HTML comments, as the raw text
+    of the page is searched.
+
+    Args:
+        html (str): HTML of the page
+        table_ids (tuple): Candidate ids of the table
+
+    Returns:
+        :return Index of the table's opening tag in 'html', or None
+    """
+    for table_id in table_ids:
+        for quote in ('"', "'"):
+            pos = html.find(f"id={quote}{table_id}{quote}")
+            if pos != -1:
+                start = html.rfind("<table", 0, pos)
+                if start != -1:
+                    return start
+    return None
+
+
+def extract_rows(html, table_ids):
+    """
+    Parses only the table with one of the ids 'table_ids' and stops as soon
+    as the table is complete.
+
+    Args:
+        html (str): HTML of the page
+        table_ids (tuple): Candidate ids of the table
+
+    Returns:
+        :return Column names (list of str) and rows (list of lists of str), or
+                None if the page has no such table
+    """
+    start = _locate(html, table_ids)
+    if start is None:
+        return None
+    parser = _TableParser()
+    try:
+        parser.feed(html[start:])
+        parser.close()
+    except _TableComplete:
+        pass
+    return parser.header, parser.rows
+
+
+def _column_names(header):
+    """
+    Names the columns the way pandas.read_html() does: empty names become
+    "Unnamed: i", repeated names get the suffixes ".1", ".2", ...
+    """
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        if not name:
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def extract_table(html, table_ids):
+    """
+    Parses the table with one of the ids 'table_ids' into a pandas DataFrame,
+    converting numeric columns like pandas.read_html() does.
+
+    Args:
+        html (str): HTML of the page
+        table_ids (tuple): Candidate ids of the table
+
+    Returns:
+        :return The table in a pandas DataFrame, or None if the page has no
+                such table
+    """
+    extracted = extract_rows(html, table_ids)
+    if extracted is None:
+        return None
+    header, rows = extracted
+    width = len(header)
+    # pad or cut rows to the width of the header
+    rows = [(row + [""] * width)[:width] for row in rows]
+
+    table = pd.DataFrame(rows, columns=_column_names(header))
+    # empty cells are missing values (mask() instead of replace(), which
+    # downcasts silently and warns about it since pandas 2.2)
+    table = table.mask(table.eq(""))
+    for col in table.columns:
+        try:
+            table[col] = pd.to_numeric(table[col])
+        except (ValueError, TypeError):
+            pass   # not a numeric column
+    return table
@@ -1,7 +1,25 @@
+import lazy
 import utils
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
+import profiling
+import itertools
+
+# matplotlib is only imported once a plot is created
+mpl = lazy.module("matplotlib")
+style = lazy.module("matplotlib.style")
+figure = lazy.module("matplotlib.figure")
+np = lazy.module("numpy")
+pd = lazy.module("pandas")
+
+
+STYLE = "fivethirtyeight"
+# increase whenever the look of the plots changes, so that plots exported
+# before are rendered again (see query_io.export())
+STYLE_VERSION = 2
+# line styles of the smoothings overlaid on the main smoothing in lineplot()
+OVERLAY_STYLES = ("dotted", "dashdot", (0, (5, 1)), (0, (3, 1, 1, 1, 1, 1)))
+# percentile ranges of the league shaded behind the bars and scatter points
+# (the inner band is shaded twice, and thus darker)
+LEAGUE_BANDS = ((0.1, 0.9), (0.25, 0.75))
 
 
 def visualize(data, query):
@@ -18,23 +36,70 @@ def visualize(data, query):
     """
     aspect, teams, season = query
 
-    plt.style.use("fivethirtyeight")
-
-    if aspect == "mar":
-        plot = lineplot(data, teams, season)
-    elif aspect == "a/t":
-        plot = scatterplot(data, teams, season)
-    elif aspect == "acc":
-        plot = grouped_barplot(data, teams, season)
-    else:
-        plot = simple_barplot(aspect, data, teams, season)
+    # the style only applies to the figure created within this block, the
+    # global matplotlib settings are left untouched
+    with style.context(STYLE):
+        if aspect == "mar":
+            plot = lineplot(data, teams, season)
+        elif isinstance(season, range):
+            plot = trendplot(aspect, data, teams, season)
+        elif aspect == "a/t":
+            plot = scatterplot(data, teams, season)
+        elif aspect == "acc":
+            plot = grouped_barplot(data, teams, season)
+        else:
+            plot = simple_barplot(aspect, data, teams, season)
 
     return plot
 
 
+def _league_bands(ax, data, stat, color="gray", axis="y", extent=None, label=None):
+    """
+    Draws the league median of 'stat' as a dashed line and the percentile
+    ranges LEAGUE_BANDS as shaded bands, if the league quantiles are attached
+    to 'data' (see sourcing.get_season_stats() and league.py).
+
+    Args:
+        ax (Axes): The axes to draw on
+        data (DataFrame): The data of the plot
+        stat (str): Column of the season statistics, f. ex. "PTS"
+        color: Color of the line and the bands
+        axis (str): Axis of the values of 'stat', "x" or "y"
+        extent (tuple): Start and end of the line and the bands along the
+                        x axis (only for axis="y"), the whole axis if None
+        label (str): Label of the median line in the legend
+
+    Returns:
+        :return The league quantiles of 'stat' (dict), None if there are none
+    """
+    quantiles = data.attrs.get("league", {}).get(stat)
+    if quantiles is None or not np.isfinite(quantiles[0.5]):
+        return None
+
+    band = dict(color=color, alpha=0.12, linewidth=0, zorder=0)
+    line = dict(color=color, linestyle="dashed", linewidth=2, zorder=1, label=label)
+    for low, high in LEAGUE_BANDS:
+        if extent is not None:
+            ax.fill_between(extent, quantiles[low], quantiles[high], **band)
+        elif axis == "y":
+            ax.axhspan(quantiles[low], quantiles[high], **band)
+        else:
+            ax.axvspan(quantiles[low], quantiles[high], **band)
+    if extent is not None:
+        ax.plot(extent, [quantiles[0.5]] * 2, **line)
+    elif axis == "y":
+        ax.axhline(quantiles[0.5], **line)
+    else:
+        ax.axvline(quantiles[0.5], **line)
+    return quantiles
+
+
+@profiling.timed("lineplot")
 def lineplot(data, teams, season):
     """
-    Visualizes winning/losing margins in a lineplot.
+    Visualizes winning/losing margins in a lineplot. Further smoothings in
+    'data' (see sourcing.margins_frame()) are overlaid on the main smoothing,
+    each in its own line style.
 
     Args:
         data (DataFrame): Winning/losing margins for all games in the season
@@ -44,31 +109,47 @@ def lineplot(data, teams, season):
     Returns:
         :return Plot as a matplotlib Figure
     """
-    fig, ax = plt.subplots()
+    fig = figure.Figure()
+    ax = fig.subplots()
+    colors = itertools.cycle(mpl.rcParams["axes.prop_cycle"].by_key()["color"])
 
     for team in teams:
         # plot margins & smoothed margins in the same color
-        team_color = next(ax._get_lines.prop_cycler)['color']
+        team_color = next(colors)
         # plot margins
-        data[f"{team}_margin"].plot(  # may raise a KeyError
-            ax=ax,
+        ax.plot(
+            data.index,
+            data[f"{team}_margin"],  # may raise a KeyError
             color=team_color,
             linewidth=2,
             alpha=0.2,
             label=team
         )
         # plot smoothed margins
-        data[f"{team}_smoothed"].plot(
-            ax=ax,
+        ax.plot(
+            data.index,
+            data[f"{team}_smoothed"],
             color=team_color,
             linewidth=3,
             linestyle="dashed",
             label=f"{team} smooth"
         )
+        # plot further smoothings
+        overlays = [col for col in data.columns if col.startswith(f"{team}_smoothed ")]
+        for col, linestyle in zip(overlays, itertools.cycle(OVERLAY_STYLES)):
+            ax.plot(
+                data.index,
+                data[col],
+                color=team_color,
+                linewidth=2,
+                linestyle=linestyle,
+                label=f"{team} {col.split(' ', 1)[1]}"
+            )
 
     ax.axhline(y=0, color="dimgray", linewidth=1)
-    plt.grid(axis="x")
-    ax.legend();
+    ax.grid(axis="x")
+    # spread the legend over several columns when many teams are plotted
+    ax.legend(ncol=len(teams) // 8 + 1);
     ax.set(
         ylabel = "Winning / Losing Margin (points)",
         xlabel = "Game No.",
@@ -80,6 +161,7 @@ def lineplot(data, teams, season):
     return fig
 
 
+@profiling.timed("scatterplot")
 def scatterplot(data, teams, season):
     """
     Visualizes assists and turnovers in a scatterplot.
@@ -92,9 +174,12 @@ def scatterplot(data, teams, season):
     Returns:
         :return Plot as a matplotlib Figure
     """
-    fig, ax = plt.subplots()
+    fig = figure.Figure()
+    ax = fig.subplots()
 
-    ax.scatter(data["AST"], data["TOV"], s=200)
+    _league_bands(ax, data, "AST", axis="x", label="League median")
+    _league_bands(ax, data, "TOV", axis="y")
+    ax.scatter(data["AST"], data["TOV"], s=200, zorder=2)
     for team in teams:
         ax.annotate(
             text=team,
@@ -112,11 +197,14 @@ def scatterplot(data, teams, season):
         ylabel="Turnovers",
         title = f"Average Number of Assists vs Turnovers in {'NBA' if season >= 1950 else 'BAA'} season {season-1}/{season}"
     )
+    if "league" in data.attrs:
+        ax.legend(loc="upper left")
     fig.set_size_inches(10,10)
 
     return fig
 
 
+@profiling.timed("grouped_barplot")
 def grouped_barplot(data, teams, season):
     """
     Visualizes accuracy regarding 3- and 2-point-shots as well as free throws
@@ -130,7 +218,8 @@ def grouped_barplot(data, teams, season):
     Returns:
         :return Plot as a matplotlib Figure
     """
-    fig, ax = plt.subplots()
+    fig = figure.Figure()
+    ax = fig.subplots()
 
     bars_roots = np.arange(len(teams))
     width = 0.22
@@ -158,16 +247,28 @@ def grouped_barplot(data, teams, season):
     ax.bar_label(bars_3P, padding=5)
     ax.bar_label(bars_2P, padding=5)
     ax.bar_label(bars_FT, padding=5)
+
+    # league median and percentile bands of each stat, behind the bars of
+    # the stat and in the same color
+    for i, (stat, bars) in enumerate(zip(["3P%", "2P%", "FT%"], [bars_3P, bars_2P, bars_FT])):
+        offset = (i - 1) * width
+        _league_bands(
+            ax, data, stat,
+            color=bars.patches[0].get_facecolor()[:3],
+            extent=(bars_roots[0] + offset - width / 2, bars_roots[-1] + offset + width / 2),
+            label="League medians" if i == 0 else None
+        )
     ax.set_title(f"Shooting Accuracy in {'NBA' if season >= 1950 else 'BAA'} season {season-1}/{season}")
     ax.set_ylabel("Accuracy")
     ax.set_xticks(bars_roots, teams)
     ax.legend(loc=4)
-    plt.grid(axis="x")
+    ax.grid(axis="x")
     fig.set_size_inches(len(teams)*4, 7)
 
     return fig
 
 
+@profiling.timed("simple_barplot")
 def simple_barplot(aspect, data, teams, season):
     """
     Visualizes 'aspect' in a bar plot.
@@ -181,15 +282,21 @@ def simple_barplot(aspect, data, teams, season):
     Returns:
         :return Plot as a matplotlib Figure
     """
-    fig, ax = plt.subplots()
+    fig = figure.Figure()
+    ax = fig.subplots()
 
     bars = ax.bar(teams, data[aspect.upper()], width=0.8)
     ax.bar_label(bars, padding=3, fontsize="large")
-
-    # adapt range of y-axis for legibility / discriminability:
-    if len(teams) > 1:
-        low = np.min(data.values)
-        high = np.max(data.values)
+    quantiles = _league_bands(ax, data, aspect.upper(), label="League median")
+
+    # adapt range of y-axis for legibility / discriminability (so that the
+    # league median and its 25-75 percentile band are visible as well):
+    values = data.values.ravel()
+    if quantiles is not None:
+        values = np.append(values, [quantiles[0.25], quantiles[0.75]])
+    if len(values) > 1:
+        low = np.min(values)
+        high = np.max(values)
         ax.set_ylim([
             np.ceil(low-0.6*(high-low)),
             np.ceil(high+0.4*(high-low))
@@ -207,7 +314,53 @@ def simple_barplot(aspect, data, teams, season):
         title=f"{aspect_variants['plot title']} in {'NBA' if season >= 1950 else 'BAA'} season {season-1}/{season}"
     )
 
-    plt.grid(axis="x")
+    ax.grid(axis="x")
+    if quantiles is not None:
+        ax.legend(fontsize="small")
     fig.set_size_inches(len(teams)*1.5, 3)
 
     return fig
+
+
+@profiling.timed("trendplot")
+def trendplot(aspect, data, teams, seasons):
+    """
+    Visualizes the trend of 'aspect' over several seasons in line plots, one
+    for each statistic belonging to 'aspect'.
+
+    Args:
+        aspect (str): The queried aspect
+        data (DataFrame): The statistics of all teams in all seasons (index:
+                          seasons, columns: (stat, team))
+        teams (list): The queried team(s)
+        seasons (range): The queried seasons
+
+    Returns:
+        :return Plot as a matplotlib Figure
+    """
+    cols = utils.aspects().loc[aspect, "corresponding cols"]
+
+    fig = figure.Figure()
+    axes = fig.subplots(len(cols), 1, sharex=True, squeeze=False)[:, 0]
+    colors = itertools.cycle(mpl.rcParams["axes.prop_cycle"].by_key()["color"])
+    # each team keeps its color in all subplots
+    team_colors = {team: next(colors) for team in teams}
+
+    for ax, col in zip(axes, cols):
+        for team in teams:
+            ax.plot(
+                data.index,
+                data[(col, team)],
+                color=team_colors[team],
+                linewidth=3,
+                marker="o",
+                label=team
+            )
+        ax.set_ylabel(col)
+
+    axes[0].legend()
+    axes[0].set_title(f"{utils.aspects().loc[aspect, 'plot title']} in {utils.season_label(seasons)}")
+    axes[-1].set_xlabel("Season (ending year)")
+    fig.set_size_inches(16, 4.5 * len(cols))
+
+    return fig
@@ -0,0 +1,92 @@
+"""
+Speculative prefetching during the dialogue of query_io.get_query(): while
+the user is still typing, the pages that will be needed are fetched and
+parsed in background threads, so that they are often in the run store by the
+time sourcing.get_data() asks for them. Everything goes through
+utils.scrape_season_stats() and utils.scrape_team_games(), so the foreground
+waits for a page that is being prefetched instead of fetching it again (see
+cache.remember()).
+"""
+import queue
+import utils
+import archive
+import fetching
+import threading
+import warehouse
+
+
+# jobs waiting to be run by the background threads
+_queue = queue.Queue()
+# everything that has been submitted, so that nothing is prefetched twice
+_submitted = set()
+_threads = []
+_lock = threading.Lock()
+
+
+def _work():
+    while True:
+        job = _queue.get()
+        try:
+            job()
+        except Exception:
+            # if the page is needed after all, the error shows up again when
+            # it is fetched in the foreground
+            pass
+
+
+def _submit(key, job):
+    """
+    Runs 'job' in the background unless a job with the same 'key' has been
+    submitted before. The threads are started on first use; they are daemon
+    threads, so they never keep the program from exiting.
+    """
+    with _lock:
+        if key in _submitted:
+            return
+        _submitted.add(key)
+        if not _threads:
+            for _ in range(fetching.MAX_WORKERS):
+                thread = threading.Thread(target=_work, daemon=True)
+                thread.start()
+                _threads.append(thread)
+    _queue.put(job)
+
+
+def season_stats(aspect, season):
+    """
+    Prefetches the league page(s) of 'season' as soon as the season has been
+    entered, unless they are not needed for 'aspect' or are in the warehouse.
+
+    Args:
+        aspect (str): The queried aspect
+        season (int or range): The queried season(s)
+
+    Returns:
+        :return None
+    """
+    if aspect == "mar":
+        return   # margins only need the game logs
+    for s in season if isinstance(season, range) else [season]:
+        if not warehouse.has_season(s):
+            _submit(("season stats", s), lambda s=s: utils.scrape_season_stats(s))
+
+
+def team_games(aspect, team, season):
+    """
+    Prefetches the game log of 'team' as soon as the team has been
+    recognized, if it is needed for 'aspect' and its margins are neither in
+    the warehouse nor in the archive.
+
+    Args:
+        aspect (str): The queried aspect
+        team (str): Abbreviation bbref uses for the team
+        season (int or range): The queried season(s)
+
+    Returns:
+        :return None
+    """
+    if aspect != "mar" or isinstance(season, range) or warehouse.has_season(season, "team_games"):
+        return
+    if archive.read(team, season) is not None:
+        return
+    _submit(("team games", team, season), lambda: utils.scrape_team_games(team, season))
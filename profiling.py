@@ -0,0 +1,174 @@
+import json
+import time
+import functools
+import threading
+import contextlib
+import tracemalloc
+
+
+# whether spans are recorded at all (set by enable(), f. ex. via the --profile
+# flag of main.py); while disabled, span() and timed() cost next to nothing
+enabled = False
+
+# all finished spans of this run
+_spans = []
+_lock = threading.Lock()
+# spans that are open at the moment, per thread
+_open = threading.local()
+_start = time.perf_counter()
+_no_span = contextlib.nullcontext()
+
+
+def enable():
+    """
+    Starts recording spans and tracing memory allocations.
+
+    Returns:
+        :return None
+    """
+    global enabled, _start
+    enabled = True
+    _start = time.perf_counter()
+    tracemalloc.start()
+
+
+class _Span:
+    """
+    Records the duration of the enclosed block, the counters added to it via
+    add(), and the peak memory usage of the run at the end of the block.
+    """
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = _open.__dict__.setdefault("stack", [])
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        _open.stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        with _lock:
+            _spans.append({
+                "name": self.name,
+                "parent": self.parent,
+                "thread": threading.get_ident(),
+                "start": self.begin - _start,
+                "duration": end - self.begin,
+                "memory": current,
+                "peak memory": peak,
+                "args": self.attrs
+            })
+        return False
+
+
+def span(name, **attrs):
+    """
+    Returns a context manager that records the enclosed block as span 'name'
+    (if profiling is enabled).
+
+    Args:
+        name (str): Name of the span, f. ex. "savefig"
+        **attrs: Additional information stored with the span
+
+    Returns:
+        :return Context manager
+    """
+    return _Span(name, attrs) if enabled else _no_span
+
+
+def timed(name):
+    """
+    Decorator recording every call of the decorated function as span 'name'
+    (if profiling is enabled).
+
+    Args:
+        name (str): Name of the span
+
+    Returns:
+        :return Decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add(**counters):
+    """
+    Adds to counters (f. ex. bytes=...) of the innermost open span of the
+    current thread.
+
+    Args:
+        **counters: Names and values to add
+
+    Returns:
+        :return None
+    """
+    if not enabled:
+        return
+    stack = getattr(_open, "stack", None)
+    if stack:
+        args = stack[-1].attrs
+        for counter, value in counters.items():
+            args[counter] = args.get(counter, 0) + value
+
+
+def write_trace(path):
+    """
+    Writes all recorded spans as JSON in the trace event format, which can be
+    viewed f. ex. in chrome://tracing or https://ui.perfetto.dev.
+
+    Args:
+        path (str): Path of the trace file
+
+    Returns:
+        :return None
+    """
+    events = [{
+        "name": s["name"],
+        "ph": "X",
+        "ts": s["start"] * 1e6,
+        "dur": s["duration"] * 1e6,
+        "pid": 0,
+        "tid": s["thread"],
+        "args": dict(s["args"], memory=s["memory"], peak_memory=s["peak memory"])
+    } for s in _spans]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def summary():
+    """
+    Returns a table summarizing all recorded spans by name: number of calls,
+    total and maximum duration, bytes fetched, and peak memory usage.
+
+    Returns:
+        :return Summary table (str)
+    """
+    rows = {}
+    for s in _spans:
+        row = rows.setdefault(s["name"], {"calls": 0, "total": 0.0, "max": 0.0, "bytes": 0, "peak": 0})
+        row["calls"] += 1
+        row["total"] += s["duration"]
+        row["max"] = max(row["max"], s["duration"])
+        row["bytes"] += s["args"].get("bytes", 0)
+        row["peak"] = max(row["peak"], s["peak memory"])
+
+    lines = [f"{'span':<24}{'calls':>7}{'total':>11}{'max':>11}{'fetched':>11}{'peak mem':>11}"]
+    for name, row in sorted(rows.items(), key=lambda item: -item[1]["total"]):
+        lines.append(
+            f"{name:<24}{row['calls']:>7}{row['total']*1000:>9.1f}ms{row['max']*1000:>9.1f}ms"
+            f"{row['bytes']/1024:>9.0f}kB{row['peak']/2**20:>9.1f}MB"
+        )
+    return "\n".join(lines)
@@ -1,8 +1,24 @@
 import utils
-import urllib
-import pandas as pd
-import matplotlib.pyplot as plt
+import plotting
+import profiling
+import prefetch
+import franchises
+import lazy
 import os
+import json
+import hashlib
+import contextlib
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+
+pd = lazy.module("pandas")
+
+# file in the 'visualizations' folder that maps plot hashes to file names
+MANIFEST = "manifest.json"
 
 
 def get_query():
@@ -12,8 +28,8 @@ def get_query():
     achieved via a dialogue in the terminal.
 
     Returns:
-        :return Aspect to visualize (str), season (int), and list of teams in a
-                3-place list
+        :return Aspect to visualize (str), season (int, or range for a span of
+                seasons), and list of teams in a 3-place list
     """
 
     # aspect
@@ -24,9 +40,11 @@ def get_query():
         Type in:      Option:"""
     )
     # print all aspect options and their corresponding abbreviation:
-    aspects = utils.aspects()
-    for abbr in aspects.index:
-        print("\t     ", abbr, "\t", aspects.loc[abbr, "full"])
+    # (plain dictionaries, so that pandas is not imported before the first
+    # prompt)
+    aspects = utils.aspect_info()
+    for abbr in aspects:
+        print("\t     ", abbr, "\t", aspects[abbr]["full"])
     print("")   # one free line between options and input
     aspect = get_suitable_input("Aspect: ", required=(aspects))
 
@@ -37,6 +55,10 @@ def get_query():
         Please type in the year in which the season ended.
         For example, if you are interested in season 2021/22, type in:
             2022
+        For all aspects except margins, you can also follow the trend over
+        several seasons by typing in the ending years of the first and the
+        last season, f. ex. for all seasons from 1989/90 to 2021/22:
+            1990-2022
         """
     )
     season = get_suitable_input("Ending year of season: ", required=(aspect, aspects))
@@ -50,12 +72,11 @@ def get_query():
         separate them by a comma. For example, if you are interested
         in Miami Heat and Dallas Mavericks, you can type in:
             MIA, Dallas Mavericks
+        To compare all teams of the league, type in:
+            all
         """
     )
-    names_abbrs = utils.abbreviations()
-    # flip the names_abbrs dictionary
-    abbrs_names = dict((abbr, name) for (name, abbr) in names_abbrs.items())
-    teams = get_suitable_input("Team(s): ", required=(aspect, season, abbrs_names, names_abbrs))
+    teams = get_suitable_input("Team(s): ", required=(aspect, season))
 
     # get a nicely legible string representation of all queried teams and their
     # respective abbreviation used by bbref
@@ -65,14 +86,17 @@ def get_query():
             # insert an "and" in front of the last team in the enumeration
             teams_verbal_enum += "and "
         # represent each team like this: "Full name (Abbreviation)"
-        teams_verbal_enum += f"{abbrs_names[team]} ({team})"
+        if isinstance(season, range):
+            teams_verbal_enum += f"{franchises.franchise_name(team)} ({team})"
+        else:
+            teams_verbal_enum += f"{franchises.name(team, season)} ({team})"
         if len(teams) > 2 and team != teams[-1]:
             teams_verbal_enum += ", "
         elif len(teams) == 2 and team != teams[-1]:
             # ensuring that there is a blank space before the "and"
             teams_verbal_enum += " "
 
-    print(f"\n\nVisualizing {aspects.loc[aspect, 'short']} data of {teams_verbal_enum} in {'NBA' if season >= 1950 else 'BAA'} season {season-1}/{season} ...\n")
+    print(f"\n\nVisualizing {aspects.loc[aspect, 'short']} data of {teams_verbal_enum} in {utils.season_label(season)} ...\n")
     return [aspect, teams, season]
 
 
@@ -99,7 +123,7 @@ def get_suitable_input(category, required=None):
         if category == "Aspect: ":
             aspects = required
             try:
-                if not inp in aspects.index:
+                if not inp in aspects:
                     raise ValueError
             except ValueError:
                 print("Please choose one of the options given above.")
@@ -110,82 +134,65 @@ def get_suitable_input(category, required=None):
             aspect, aspects = required
             # season from which on data required for visualizing 'aspect'
             # is available:
-            min_season = aspects.loc[aspect, "availability"]
+            min_season = aspects[aspect]["availability"]
             try:
-                inp = int(inp)   # may raise a ValueError
-                if not min_season <= inp <= 2022:
+                inp = utils.parse_seasons(inp)   # may raise a ValueError
+                if isinstance(inp, range) and aspect == "mar":
+                    raise TypeError
+                seasons = inp if isinstance(inp, range) else [inp]
+                if not (min_season <= seasons[0] and seasons[-1] <= 2022):
                     raise Exception
             except ValueError:
-                print("Please make sure to type in the year in which the season ended.")
+                print("Please make sure to type in the year in which the season ended (or the years in which the first and the last season ended, separated by a hyphen).")
+            except TypeError:
+                print("Margins can only be visualized for a single season.")
             except Exception:
-                print(f"Data required for visualizing {aspects.loc[aspect, 'short']} is available from the season ending in {min_season} on, until the season ending in 2022.")
+                print(f"Data required for visualizing {aspects[aspect]['short']} is available from the season ending in {min_season} on, until the season ending in 2022.")
             else:
                 suitable_input = True
+                # start fetching the league page(s) while the user types in
+                # the teams
+                prefetch.season_stats(aspect, inp)
 
         elif category == "Team(s): ":
-            aspect, season, abbrs_names, names_abbrs = required
-            # get all teams that participated in season, convert to all caps in
-            # order to allow case insensitive input by ...
-            possible_teams = utils.scrape_season_stats(season).set_index("Team").index.str.upper()
+            aspect, season = required
 
-            # ... converting also the input to all caps
+            if inp.strip().upper() == "ALL":
+                # all teams that participated in the season(s)
+                inp = franchises.all_teams(season)
+                for team in inp:
+                    prefetch.team_games(aspect, team, season)
+                suitable_input = True
+                continue
+
+            # convert to all caps in order to allow case insensitive input
             inp = inp.upper().split(", ")
             to_be_removed = []
-            # Here things get a bit complex. Essentially, what we are doing
-            # here is checking whether the queried teams participated in the
-            # queried season. We do this by comparing their full names to the
-            # full names of those teams listed in the table containing average
-            # season statistics.
-            # If we compared the abbreviations, it could be that a team which
-            # did actually participate in the queried season is rejected
-            # because the dictionary we use (utils.abbreviations()) is not
-            # complete and correct. (We elaborate on this in README.md.)
-            # Evading this by comparing full team names requires one additional
-            # step (converting abbreviations to full names and then back), but
-            # also enables more precise and accurate feedback.
+            # Checking whether the queried teams participated in the queried
+            # season is a lookup in the franchise registry (franchises.py),
+            # which knows for every season which names and abbreviations refer
+            # to which team, and which abbreviation bbref uses for it.
             for i, team in enumerate(inp):
-                # convert abbreviations to full team names
-                if len(team) == 3:
-                    try:
-                        inp[i] = abbrs_names[team]
-                    except KeyError:
-                        to_be_removed.append(team)
-                        print(f"It seems that {team} is not used as an abbreviation for any team on BBREF.")
-                        other_team = input("You can try the team's full name, specify another team, or just press enter: ").upper()
-                        if other_team:
-                            inp.append(other_team)
-                        continue
-                if not (inp[i] in possible_teams):
-                    to_be_removed.append(inp[i])
-                    print(f"It seems that '{inp[i]}' did not participate in NBA season {season-1}/{season}.")
-                    other_team = input("Specify another team, or just press enter: ").upper()
-                    if other_team:
-                        inp.append(other_team)
-                else:   # 'team' did participate in season
-                    try:
-                        fullname = inp[i]
-                        # convert to abbreviation
-                        inp[i] = names_abbrs[inp[i]]
-                        # correctness of abbreviations is crucial only for
-                        # aspect 'mar', as here the abbreviation is required for
-                        # obtaining the data. For all other aspects, it doesn't
-                        # matter so much whether the abbreviation in the plot
-                        # and the filename differs from the one used on BBREF.
-                        if aspect == "mar":
-                            test_url = f"https://www.basketball-reference.com/teams/{inp[i]}/{season}_games.html"
-                            test_fetch = pd.read_html(test_url)
-                    except KeyError:
-                        to_be_removed.append(inp[i])
-                        print(f"Sorry, we do not know the abbreviation BBREF uses for '{inp[i]}' (because utils.abbreviations() is incomplete, see README.md).")
-                        other_team = input("Specify another team, or just press enter: ").upper()
-                        if other_team:
-                            inp.append(other_team)
-                    except urllib.error.HTTPError:
-                        to_be_removed.append(inp[i])
-                        print(f"Sorry, we do not know the abbreviation BBREF uses for '{fullname}' (because utils.abbreviations() is incorrect, see README.md).")
-                        other_team = input("Specify another team, or just press enter: ").upper()
-                        if other_team:
-                            inp.append(other_team)
+                if isinstance(season, range):
+                    # for a span of seasons, teams are identified by their
+                    # franchise, as they may have been renamed or relocated
+                    code = franchises.resolve_franchise(team, season)
+                else:
+                    code = franchises.resolve(team, season)
+                if code is not None:
+                    # convert to the abbreviation used by bbref
+                    inp[i] = code
+                    # start fetching the team's game log right away
+                    prefetch.team_games(aspect, code, season)
+                    continue
+                to_be_removed.append(team)
+                if franchises.is_known(team):
+                    print(f"It seems that '{team}' did not participate in {utils.season_label(season)}.")
+                else:
+                    print(f"It seems that '{team}' is neither the name nor an abbreviation of any team on BBREF.")
+                other_team = input("You can try the team's full name, specify another team, or just press enter: ").upper()
+                if other_team:
+                    inp.append(other_team)
             for team in to_be_removed:
                 inp.remove(team)
             # if any teams are left by now, we do have suitable input
@@ -194,43 +201,149 @@ def get_suitable_input(category, required=None):
                 # remove duplicates while retaining order
                 inp = list(dict.fromkeys(inp))
             else:
-                print(f"\nNone of the queried teams participated in season {season-1}/{season}. Please choose a different set of teams.")
+                print(f"\nNone of the queried teams participated in {utils.season_label(season)}. Please choose a different set of teams.")
 
     return inp
 
 
-def export(plot, query):
+def export(data, query, notify=True):
     """
-    Save the plot to the current directory and print a corresponding
-    notification.
+    Save the plot of 'data' to the current directory and print a corresponding
+    notification. The plot is only rendered (by plotting.visualize()) if the
+    data, the query or the look of the plots (plotting.STYLE_VERSION) changed
+    since it was saved last time: a manifest in the folder maps the hash of
+    these to the file holding the plot.
 
     Args:
-        plot (matplotlib Figure): The queried plot
+        data (DataFrame): All and only the data required for visualization
         query (list): Queried aspect, teams, and season
+        notify (bool): Whether to print the notification
 
     Return:
-        :return None
+        :return Path of the saved file (str)
     """
-    aspect, teams, season = query
-
     current_dir = os.getcwd()
     folder = "visualizations"
 
     # create a folder 'visualizations' if it doesn't exist in the current dir
-    if not os.path.isdir(f"{current_dir}/{folder}"):
-        os.mkdir(f"{current_dir}/{folder}")
+    # (exist_ok, as several rendering processes may try this at the same time)
+    os.makedirs(f"{current_dir}/{folder}", exist_ok=True)
 
-    # file name contains aspect, teams, and season
-    filename = f"plot-{utils.aspects().loc[aspect, 'file title']}-{'_'.join(teams)}-{season-1}_{season}.png"
+    filename = file_name(query)
     path = f"{folder}/{filename}"
 
-    plot.savefig(
-        path,
-        bbox_inches="tight"
-    )
-    print(f"""
+    key = plot_hash(data, query)
+    manifest = _read_manifest(folder)
+    entry = manifest.get(key)
+    # the entry is only valid if the file has not been overwritten since
+    if not (entry and entry["file"] == filename and os.path.isfile(path)
+            and os.path.getmtime(path) == entry["mtime"]):
+        plot = plotting.visualize(data, query)
+        with profiling.span("savefig", file=filename):
+            plot.savefig(
+                path,
+                bbox_inches="tight"
+            )
+        plot.clear()
+        _update_manifest(folder, key, filename, os.path.getmtime(path))
+
+    if notify:
+        print(f"""
         The plot can be found under
             {current_dir}/{folder}
         as
             {filename}
     """)
+
+    return path
+
+
+def file_name(query, extension="png"):
+    """
+    Returns the name of the file the plot for 'query' is saved as, f. ex.
+    "plot-points-MIA_DAL-2021_2022.png".
+
+    Args:
+        query (list): Queried aspect, teams, and season
+        extension (str): Extension of the file (its format)
+
+    Returns:
+        :return File name (str)
+    """
+    aspect, teams, season = query
+    # file name contains aspect, teams, and season
+    return f"plot-{utils.aspect_info()[aspect]['file title']}-{'_'.join(teams)}-{utils.season_file_title(season)}.{extension}"
+
+
+def plot_hash(data, query):
+    """
+    Computes a hash over everything the plot depends on: the data (and its
+    attrs), the query and the version of the plotting code.
+
+    Args:
+        data (DataFrame): All and only the data required for visualization
+        query (list): Queried aspect, teams, and season
+
+    Returns:
+        :return Hexadecimal SHA-256 hash (str)
+    """
+    aspect, teams, season = query
+    if isinstance(season, range):
+        season = (season[0], season[-1])
+    digest = hashlib.sha256()
+    digest.update(repr((aspect, list(teams), season, plotting.STYLE_VERSION)).encode())
+    digest.update(repr((list(data.columns), list(data.index))).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    # f. ex. the league quantiles drawn in the bar plots
+    digest.update(repr(sorted(data.attrs.items())).encode())
+    return digest.hexdigest()
+
+
+def _read_manifest(folder):
+    path = f"{folder}/{MANIFEST}"
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextlib.contextmanager
+def _manifest_lock(folder):
+    """
+    Holds an exclusive lock on the manifest in 'folder' (via a lock file next
+    to it) while the block is run, also against other processes.
+    """
+    with open(f"{folder}/{MANIFEST}.lock", "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _update_manifest(folder, key, filename, mtime):
+    """
+    Records that the plot with the hash 'key' is stored in 'filename', and
+    removes all entries of plots that were stored in 'filename' before.
+    Several rendering processes update the manifest at the same time, so it
+    is locked from reading to writing (otherwise, entries written by one
+    process in the meantime would be lost), and replaced atomically, so that
+    it stays readable for the processes that only read it.
+    """
+    with _manifest_lock(folder):
+        manifest = _read_manifest(folder)
+        manifest = {k: v for k, v in manifest.items() if v["file"] != filename}
+        manifest[key] = {"file": filename, "mtime": mtime}
+        path = f"{folder}/{MANIFEST}"
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, path)
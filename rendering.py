@@ -0,0 +1,234 @@
+import io
+import os
+import time
+import lazy
+import tarfile
+import zipfile
+import plotting
+import query_io
+import profiling
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+mpl = lazy.module("matplotlib")
+backend_pdf = lazy.module("matplotlib.backends.backend_pdf")
+
+# formats of the files render_bundle() writes all plots into
+BUNDLE_FORMATS = ("pdf", "zip", "tar", "tar.gz")
+
+
+def _init_worker():
+    # render without any display, regardless of the configured backend
+    mpl.use("Agg")
+
+
+def render(data, query):
+    """
+    Plots 'data' according to 'query' and exports the plot (unless it has
+    been exported before, see query_io.export()). The figure is cleared right
+    after it has been saved, so that its memory is released immediately
+    instead of whenever the garbage collector gets to it.
+
+    Args:
+        data (DataFrame): All and only the data required for visualization
+        query (list): Queried aspect, team(s), and season
+
+    Returns:
+        :return Path of the saved file (str) and the time it took to render
+                and save the plot in seconds
+    """
+    start = time.perf_counter()
+    path = query_io.export(data, query, notify=False)
+    return path, time.perf_counter() - start
+
+
+def render_image(data, query, fmt="png"):
+    """
+    Plots 'data' according to 'query' into an in-memory image. The figure is
+    cleared right after it has been saved.
+
+    Args:
+        data (DataFrame): All and only the data required for visualization
+        query (list): Queried aspect, team(s), and season
+        fmt (str): Image format, f. ex. "png" or "svg"
+
+    Returns:
+        :return Image (bytes) and the time it took to render it in seconds
+    """
+    start = time.perf_counter()
+    plot = plotting.visualize(data, query)
+    buffer = io.BytesIO()
+    with profiling.span("savefig", format=fmt):
+        plot.savefig(buffer, format=fmt, bbox_inches="tight")
+    plot.clear()
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def _bounded(function, jobs, processes):
+    """
+    Calls 'function' for every job of 'jobs' on a pool of processes and
+    yields the results in the order of 'jobs'. The jobs are taken from
+    'jobs' (which may be a generator) only as they are submitted, and at most
+    two jobs per process are submitted or finished but not yet yielded at
+    any time, so neither the jobs nor their results pile up in memory.
+    """
+    processes = processes or os.cpu_count() or 1
+    if profiling.enabled or processes == 1:
+        # (spans recorded in worker processes would be lost, so profiled runs
+        # render in this process)
+        for job in jobs:
+            yield function(job)
+        return
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as executor:
+        pending = collections.deque()
+        while True:
+            for job in jobs:
+                pending.append(executor.submit(function, job))
+                if len(pending) >= 2 * processes:
+                    break
+            if not pending:
+                return
+            yield pending.popleft().result()
+
+
+def render_many(jobs, processes=None):
+    """
+    Renders and exports several plots on a pool of processes. The jobs are
+    only taken from 'jobs' as workers become free (see _bounded()).
+
+    Args:
+        jobs (iterable): (data, query) tuples, see render(), f. ex. from a
+                         generator that prepares the data of one job at a time
+        processes (int): Number of worker processes (defaults to the number of
+                         CPU cores)
+
+    Returns:
+        :return For each job (in the order of 'jobs') either the result of
+                render() or the exception that was raised
+    """
+    return list(_bounded(_render_or_exception, jobs, processes))
+
+
+def _render_or_exception(job):
+    try:
+        return render(*job)
+    except Exception as error:
+        return error
+
+
+def _image_or_exception(job):
+    try:
+        return render_image(*job)
+    except Exception as error:
+        return error
+
+
+def bundle_format(path):
+    """
+    Determines the format of a bundle from the extension of its path.
+
+    Args:
+        path (str): Path of the bundle, f. ex. "plots.pdf" or "plots.tar.gz"
+
+    Returns:
+        :return One of BUNDLE_FORMATS, or None if the extension is unknown
+    """
+    path = path.lower()
+    if path.endswith(".tgz"):
+        return "tar.gz"
+    for fmt in sorted(BUNDLE_FORMATS, key=len, reverse=True):
+        if path.endswith("." + fmt):
+            return fmt
+    return None
+
+
+def render_bundle(jobs, target, fmt=None, processes=None):
+    """
+    Renders several plots and streams them into a single file instead of one
+    file per plot: a PDF with one page per plot, or a ZIP or TAR archive of
+    PNG images. Every plot is written as soon as it has been rendered and
+    then freed, so memory usage does not grow with the number of jobs (apart
+    from the bundle itself if 'target' is an in-memory buffer).
+
+    Args:
+        jobs (iterable): (data, query) tuples, see render() and render_many()
+        target (str or file object): Path of the bundle, or f. ex. an
+                                     io.BytesIO to hold it in memory
+        fmt (str): One of BUNDLE_FORMATS (determined from the extension of
+                   'target' if it is a path)
+        processes (int): Number of worker processes for ZIP and TAR (PDF pages
+                         are rendered in this process, which holds the PDF)
+
+    Returns:
+        :return For each job (in the order of 'jobs') either the name of the
+                plot in the bundle (str) and the time it took to render it in
+                seconds, or the exception that was raised
+    """
+    fmt = fmt or bundle_format(target)
+    if fmt not in BUNDLE_FORMATS:
+        raise ValueError(f"Bundles can only be written as {', '.join(BUNDLE_FORMATS)}.")
+    results = []
+    names = set()
+
+    def unique(name):
+        # the same plot may be requested twice
+        stem, extension = name.rsplit(".", 1)
+        n = 1
+        while name in names:
+            n += 1
+            name = f"{stem}-{n}.{extension}"
+        names.add(name)
+        return name
+
+    if fmt == "pdf":
+        with backend_pdf.PdfPages(target) as pdf:
+            for data, query in jobs:
+                start = time.perf_counter()
+                try:
+                    plot = plotting.visualize(data, query)
+                    with profiling.span("savefig", format="pdf"):
+                        pdf.savefig(plot, bbox_inches="tight")
+                    plot.clear()
+                except Exception as error:
+                    results.append(error)
+                    continue
+                results.append((f"page {pdf.get_pagecount()}", time.perf_counter() - start))
+        return results
+
+    if fmt == "zip":
+        # PNG images are compressed already
+        archive = zipfile.ZipFile(target, "w", zipfile.ZIP_STORED)
+        add = archive.writestr
+    else:
+        mode = "w:gz" if fmt == "tar.gz" else "w"
+        if isinstance(target, str):
+            archive = tarfile.open(target, mode)
+        else:
+            archive = tarfile.open(fileobj=target, mode=mode)
+
+        def add(name, image):
+            info = tarfile.TarInfo(name)
+            info.size = len(image)
+            info.mtime = time.time()
+            archive.addfile(info, io.BytesIO(image))
+
+    # the queries are needed for the names of the images (the data is only
+    # passed on to the workers)
+    queries = []
+
+    def with_query(jobs):
+        for data, query in jobs:
+            queries.append(query)
+            yield data, query
+
+    with archive:
+        for i, result in enumerate(_bounded(_image_or_exception, with_query(jobs), processes)):
+            if isinstance(result, Exception):
+                results.append(result)
+                continue
+            image, duration = result
+            name = unique(query_io.file_name(queries[i]))
+            add(name, image)
+            results.append((name, duration))
+    return results
@@ -0,0 +1,98 @@
+"""
+Compact dtypes for the tables parsed from bbref pages. Parsing yields int64,
+float64 and object columns; cast to the dtypes below, a season table or a
+game log takes a fraction of the memory, which matters once many seasons are
+held in memory at the same time.
+"""
+import lazy
+
+pd = lazy.module("pandas")
+
+
+# dtypes of the columns of the per-game statistics table (all other numeric
+# columns are float32, all other text columns categorical)
+SEASON_STATS = {
+    "Rk": "Int16",
+    "Team": "category",
+    "G": "Int16",
+}
+# dtypes of the columns of a game log
+TEAM_GAMES = {
+    "G": "Int16",
+    "Date": "object",
+    "Tm": "Int16",
+    "Opp": "Int16",
+    "W": "Int16",
+    "L": "Int16",
+}
+
+
+def _compact_dtype(col):
+    """
+    Returns the dtype for a column that is not listed in a schema.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        return "float32"
+    return "category"
+
+
+def compact(table, dtypes):
+    """
+    Casts the columns of 'table' to the dtypes given in 'dtypes', and all
+    other columns to float32 (numeric columns) or categorical (text columns).
+    A column that cannot be cast (f. ex. a column of game numbers that
+    contains fractions) is cast to float32 if it is numeric, and left as it
+    is otherwise.
+
+    Args:
+        table (DataFrame): The parsed table
+        dtypes (dict): Columns and their dtypes, f. ex. SEASON_STATS
+
+    Returns:
+        :return The table with compact dtypes (DataFrame)
+    """
+    compacted = {}
+    for name, col in table.items():
+        dtype = dtypes.get(name) or _compact_dtype(col)
+        try:
+            compacted[name] = col.astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            compacted[name] = col.astype("float32") if pd.api.types.is_numeric_dtype(col) else col
+    return pd.DataFrame(compacted, index=table.index)
+
+
+def season_stats(table):
+    """
+    Casts the per-game statistics table of a league page to compact dtypes:
+    categorical team names, int16 ranks and game counts, and float32 for all
+    other statistics.
+
+    Args:
+        table (DataFrame): Season statistics as parsed from the league page
+
+    Returns:
+        :return Season statistics with compact dtypes (DataFrame)
+    """
+    return compact(table, SEASON_STATS)
+
+
+def team_games(table):
+    """
+    Removes all rows of a game log that do not stand for a game (the header
+    rows bbref repeats within the table), and casts the rest to compact dtypes:
+    int16 game numbers, points, wins and losses, and categorical text
+    columns (except for the dates, which are all different anyway).
+
+    Args:
+        table (DataFrame): Game log as parsed from the game log page
+
+    Returns:
+        :return Game log with compact dtypes (DataFrame)
+    """
+    games = pd.to_numeric(table["G"], errors="coerce")
+    table = table[games.notna()].copy()
+    table["G"] = games[games.notna()]
+    for col in ("Tm", "Opp", "W", "L"):
+        if col in table:
+            table[col] = pd.to_numeric(table[col], errors="coerce")
+    return compact(table.reset_index(drop=True), TEAM_GAMES)
@@ -0,0 +1,214 @@
+import batch
+import argparse
+import sourcing
+import smoothing
+import rendering
+import threading
+import collections
+import urllib.parse
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# formats in which plots can be requested, and their content types
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+# maximum number of rendered images kept in memory
+MAX_IMAGES = 256
+# maximum number of queries whose prepared data is kept in memory
+MAX_DATA = 64
+
+# prepared data per canonical query, and rendered images per canonical query
+# and format (least recently used first)
+_data = collections.OrderedDict()
+_images = collections.OrderedDict()
+# computations in progress, so that concurrent requests share them
+_in_flight = {}
+_lock = threading.Lock()
+# matplotlib's style context changes global settings, so only one plot is
+# rendered at a time
+_render_lock = threading.Lock()
+
+
+def canonical(query, smoothings=None):
+    """
+    Returns the canonical form of a query, which is used as cache key: the
+    teams are sorted, a span of seasons is given by its first and last
+    season, and the smoothings of the margins are given in full (only the
+    margins depend on them).
+
+    Args:
+        query (list): Queried aspect, team(s), and season
+        smoothings (list): Canonical smoothing specs (see smoothing.parse()),
+                           None for the default one
+
+    Returns:
+        :return Canonical query (tuple)
+    """
+    aspect, teams, season = query
+    if isinstance(season, range):
+        season = (season[0], season[-1])
+    smoothings = tuple(smoothings or [smoothing.DEFAULT]) if aspect == "mar" else ()
+    return aspect, tuple(sorted(teams)), season, smoothings
+
+
+def _shared(key, compute):
+    """
+    Returns the result of 'compute' for 'key'. If the result is being
+    computed for another request at the moment, this waits for it instead of
+    computing it again.
+    """
+    with _lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    if owner:
+        try:
+            future.set_result(compute())
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            with _lock:
+                del _in_flight[key]
+    return future.result()
+
+
+def get_data(query, smoothings=None):
+    """
+    Returns the data for 'query', prepared by sourcing.get_data() once and
+    then kept in memory (for the MAX_DATA most recently used queries).
+
+    Args:
+        query (list): Queried aspect, team(s) (sorted), and season
+        smoothings (list): Canonical smoothing specs of the margins, None for
+                           the default one
+
+    Returns:
+        :return The data and the teams for which data is available
+    """
+    key = canonical(query, smoothings)
+    with _lock:
+        if key in _data:
+            _data.move_to_end(key)
+            return _data[key]
+
+    def compute():
+        aspect, teams, season = query
+        return sourcing.get_data([aspect, list(teams), season], terminate=False, smoothings=smoothings)
+
+    data = _shared(("data",) + key, compute)
+    with _lock:
+        _data[key] = data
+        while len(_data) > MAX_DATA:
+            _data.popitem(last=False)
+    return data
+
+
+def get_image(query, fmt, smoothings=None):
+    """
+    Returns the plot for 'query' as image bytes in the format 'fmt', rendered
+    into an in-memory buffer once and then kept in memory.
+
+    Args:
+        query (list): Queried aspect, team(s) (sorted), and season
+        fmt (str): One of FORMATS
+        smoothings (list): Canonical smoothing specs of the margins, None for
+                           the default one
+
+    Returns:
+        :return Image (bytes), or None if no data is available for any of the
+                queried teams
+    """
+    key = canonical(query, smoothings) + (fmt,)
+    with _lock:
+        if key in _images:
+            _images.move_to_end(key)
+            return _images[key]
+
+    def compute():
+        data, teams_updated = get_data(query, smoothings)
+        if not teams_updated:
+            return None
+        aspect, _, season = query
+        with _render_lock:
+            image, _ = rendering.render_image(data, [aspect, teams_updated, season], fmt)
+        return image
+
+    image = _shared(("image",) + key, compute)
+    with _lock:
+        _images[key] = image
+        while len(_images) > MAX_IMAGES:
+            _images.popitem(last=False)
+    return image
+
+
+class PlotHandler(BaseHTTPRequestHandler):
+    """
+    Answers requests like
+        GET /plot?aspect=pts&teams=MIA,DAL&season=2022&format=svg
+    with the image of the plot. The format defaults to png. Plots of the
+    margins also take smoothings, f. ex. &smoothing=gaussian:3,ewma:10.
+    """
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != "/plot":
+            self.send_error(404, "Only /plot is available.")
+            return
+        params = dict(urllib.parse.parse_qsl(url.query))
+        fmt = params.get("format", "png")
+        try:
+            # (invalid smoothings raise a ValueError)
+            job = batch.read_job(params)
+            query = batch.to_query(job)
+        except (KeyError, ValueError):
+            query = None
+        if query is None or fmt not in FORMATS:
+            self.send_error(400, "Please specify a valid aspect, teams, season, format and smoothing.")
+            return
+        # sorted teams, so that equal queries share one image
+        query[1] = sorted(query[1])
+
+        try:
+            image = get_image(query, fmt, job["smoothings"])
+        except Exception as error:
+            self.send_error(500, f"{type(error).__name__}: {error}")
+            return
+        if image is None:
+            self.send_error(404, "No data available for visualization.")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", FORMATS[fmt])
+        self.send_header("Content-Length", str(len(image)))
+        self.end_headers()
+        self.wfile.write(image)
+
+
+def serve(host="127.0.0.1", port=8000):
+    """
+    Runs the plot service until interrupted.
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on
+
+    Returns:
+        :return None
+    """
+    server = ThreadingHTTPServer((host, port), PlotHandler)
+    print(f"Serving plots on http://{host}:{port}/plot?aspect=pts&teams=MIA,DAL&season=2022")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve plots of basketball statistics over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    args = parser.parse_args()
+    serve(args.host, args.port)
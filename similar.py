@@ -0,0 +1,342 @@
+"""
+Similar-season search: which team-seasons had margin curves most like the one
+of a given team in a given season? The smoothed margins (see
+sourcing.get_margins()) of every team-season in the margins archive (see
+archive.py) are resampled to LENGTH points, so that seasons of different
+lengths can be compared, and stored as the rows of one matrix, the index. A
+query compares its curve with all rows of the index at once, in batches,
+either by Euclidean distance or by DTW-lite, a dynamic time warping that
+only allows shifts of up to WINDOW points and skips the candidates whose
+lower bound (LB_Keogh) cannot beat the k best distances found so far.
+
+Usage (from the root directory of the repository, after python archive.py):
+    python similar.py MIA 2022 --k 5 --metric dtw --plot similar.png
+"""
+import os
+import time
+import lazy
+import cache
+import archive
+import argparse
+import plotting
+import sourcing
+import smoothing
+import franchises
+
+np = lazy.module("numpy")
+style = lazy.module("matplotlib.style")
+
+
+# number of points every curve is resampled to
+LENGTH = 82
+# rows compared at once
+BATCH = 1024
+# candidates compared at once by DTW (smaller, so that the lower bound can
+# rule out the later batches)
+DTW_BATCH = 128
+# largest shift (in points) DTW allows
+WINDOW = 5
+METRICS = ("euclidean", "dtw")
+
+
+def _index_path(spec):
+    return os.path.join(archive.ARCHIVE_DIR, f"similar-{spec.replace(':', '_')}.npz")
+
+
+def resample(curve, length=LENGTH):
+    """
+    Resamples 'curve' to 'length' equally spaced points by linear
+    interpolation, leaving out NaNs (f. ex. games that have not been played).
+
+    Args:
+        curve (ndarray): Smoothed margins, one value per game
+        length (int): Number of points
+
+    Returns:
+        :return Resampled curve (ndarray), None if the curve has fewer than
+                two values
+    """
+    games = np.flatnonzero(np.isfinite(curve))
+    if games.size < 2:
+        return None
+    return np.interp(np.linspace(games[0], games[-1], length), games, curve[games])
+
+
+def _curves(teams, season, spec):
+    """
+    Returns the margins and smoothed margins of those of 'teams' in 'season'
+    for which there is enough data (see sourcing.get_margins()).
+    """
+    data, teams = sourcing.get_margins(list(teams), season, [spec])
+    return {
+        team: (data[f"{team}_margin"].to_numpy(), data[f"{team}_smoothed"].to_numpy())
+        for team in teams
+    }
+
+
+def build_index(spec=smoothing.DEFAULT):
+    """
+    Resamples the smoothed margins of all team-seasons in the archive and
+    saves them as the index of 'spec'.
+
+    Args:
+        spec (str): Canonical smoothing spec (see smoothing.parse())
+
+    Returns:
+        :return The index: dictionary with the resampled curves ("vectors",
+                one row per team-season), and the teams and seasons of the
+                rows
+    """
+    vectors, teams, seasons = [], [], []
+    for season in archive.seasons():
+        for team, (_, smoothed) in _curves(archive.teams(season), season, spec).items():
+            vector = resample(smoothed)
+            if vector is not None:
+                vectors.append(vector)
+                teams.append(team)
+                seasons.append(season)
+    index = {
+        "vectors": np.array(vectors, dtype=np.float32).reshape(-1, LENGTH),
+        "teams": np.array(teams, dtype=str),
+        "seasons": np.array(seasons, dtype=np.int16),
+        # the seasons of the archive the index was built from
+        "archive": np.array(archive.seasons(), dtype=np.int16),
+    }
+    os.makedirs(archive.ARCHIVE_DIR, exist_ok=True)
+    # (np.savez() appends .npz to names that do not end in it)
+    np.savez(_index_path(spec) + ".tmp.npz", **index)
+    os.replace(_index_path(spec) + ".tmp.npz", _index_path(spec))
+    return index
+
+
+def load_index(spec=smoothing.DEFAULT):
+    """
+    Returns the index of 'spec', building it first if there is none or if
+    seasons have been added to the archive since it was built. It is only
+    loaded once per run.
+
+    Args:
+        spec (str): Canonical smoothing spec (see smoothing.parse())
+
+    Returns:
+        :return The index (see build_index())
+    """
+    def load():
+        path = _index_path(spec)
+        if os.path.isfile(path):
+            with np.load(path) as f:
+                index = dict(f)
+            if index["archive"].tolist() == archive.seasons():
+                return index
+        return build_index(spec)
+    return cache.remember(("similar", spec), load)
+
+
+def euclidean(vectors, query):
+    """
+    Euclidean distances between all rows of 'vectors' and 'query', computed
+    in batches of BATCH rows.
+
+    Args:
+        vectors (ndarray): Curves, one row per team-season
+        query (ndarray): Curve of the same length
+
+    Returns:
+        :return Distances (ndarray, one per row)
+    """
+    distances = np.empty(len(vectors))
+    for start in range(0, len(vectors), BATCH):
+        diff = vectors[start:start + BATCH] - query
+        distances[start:start + BATCH] = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+    return distances
+
+
+def lb_keogh(vectors, query, window=WINDOW):
+    """
+    Lower bounds of the DTW distances between all rows of 'vectors' and
+    'query': how far each row lies outside of the range the query takes
+    within 'window' points.
+    """
+    padded = np.pad(query, window, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1)
+    upper, lower = windows.max(axis=1), windows.min(axis=1)
+    above = np.clip(vectors - upper, 0, None)
+    below = np.clip(lower - vectors, 0, None)
+    return np.sqrt(np.einsum("ij,ij->i", above, above) + np.einsum("ij,ij->i", below, below))
+
+
+def dtw(vectors, query, window=WINDOW):
+    """
+    DTW-lite: dynamic time warping distances between all rows of 'vectors'
+    and 'query', where point i of a row can only be matched with the points
+    i - 'window' to i + 'window' of the query (Sakoe-Chiba band). All rows
+    are warped at once, one point after the other.
+
+    Args:
+        vectors (ndarray): Curves, one row per team-season
+        query (ndarray): Curve of the same length
+        window (int): Largest shift (in points)
+
+    Returns:
+        :return Distances (ndarray, one per row)
+    """
+    n = len(query)
+    # accumulated costs of the previous point of the rows (column j + 1
+    # stands for point j of the query, column 0 for the start)
+    previous = np.full((len(vectors), n + 1), np.inf)
+    previous[:, 0] = 0
+    for i in range(n):
+        current = np.full_like(previous, np.inf)
+        first, last = max(0, i - window), min(n, i + window + 1)
+        costs = (vectors[:, i, np.newaxis] - query[first:last]) ** 2
+        for j in range(first, last):
+            current[:, j + 1] = costs[:, j - first] + np.minimum(
+                np.minimum(previous[:, j], previous[:, j + 1]), current[:, j]
+            )
+        previous = current
+    return np.sqrt(previous[:, n])
+
+
+def nearest(index, query, k=5, metric="euclidean", exclude=None):
+    """
+    Finds the 'k' rows of 'index' that are nearest to 'query'.
+
+    Args:
+        index (dict): The index (see load_index())
+        query (ndarray): Resampled curve (see resample())
+        k (int): Number of team-seasons to return
+        metric (str): "euclidean" or "dtw"
+        exclude (tuple): (team, season) that is left out, f. ex. the one of
+                         the query itself
+
+    Returns:
+        :return List of (team, season, distance) tuples, nearest first
+    """
+    vectors = index["vectors"]
+    candidates = np.ones(len(vectors), dtype=bool)
+    if exclude is not None:
+        candidates &= ~((index["teams"] == exclude[0]) & (index["seasons"] == exclude[1]))
+    k = min(k, int(candidates.sum()))
+    if k <= 0:
+        return []
+
+    if metric == "euclidean":
+        distances = np.where(candidates, euclidean(vectors, query), np.inf)
+    else:
+        bounds = np.where(candidates, lb_keogh(vectors, query), np.inf)
+        distances = np.full(len(vectors), np.inf)
+        order = np.argsort(bounds)[:int(candidates.sum())]
+        for start in range(0, len(order), DTW_BATCH):
+            batch = order[start:start + DTW_BATCH]
+            # the bounds are sorted, so no later candidate can beat the k
+            # best distances found so far either
+            if start >= k and bounds[batch[0]] >= np.partition(distances, k - 1)[k - 1]:
+                break
+            distances[batch] = dtw(vectors[batch], query)
+
+    best = np.argpartition(distances, k - 1)[:k]
+    best = best[np.argsort(distances[best])]
+    return [(str(index["teams"][i]), int(index["seasons"][i]), float(distances[i])) for i in best]
+
+
+def search(team, season, k=5, metric="euclidean", spec=smoothing.DEFAULT):
+    """
+    Finds the 'k' team-seasons in the archive whose smoothed margins were most
+    like those of 'team' in 'season'.
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The season
+        k (int): Number of team-seasons to return
+        metric (str): "euclidean" or "dtw"
+        spec (str): Canonical smoothing spec (see smoothing.parse())
+
+    Returns:
+        :return List of (team, season, distance) tuples, nearest first, raises
+                a ValueError if there are no margins of 'team' in 'season'
+    """
+    curves = _curves([team], season, spec)
+    query = resample(curves[team][1]) if team in curves else None
+    if query is None:
+        raise ValueError(f"There are not enough margins of {team} in season {season-1}/{season}")
+    return nearest(load_index(spec), query, k, metric, exclude=(team, season))
+
+
+def plot(team, season, matches, spec=smoothing.DEFAULT):
+    """
+    Plots the margins of 'team' in 'season' and of the team-seasons found by
+    search() with plotting.lineplot().
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The season of the query
+        matches (list): (team, season, distance) tuples
+        spec (str): Canonical smoothing spec (see smoothing.parse())
+
+    Returns:
+        :return Plot as a matplotlib Figure
+    """
+    labels, margins, smoothed = [], [], []
+    for t, s in [(team, season)] + [(t, s) for t, s, _ in matches]:
+        curves = _curves([t], s, spec)
+        if t in curves:
+            labels.append(f"{t} {s-1}/{s}")
+            margins.append(curves[t][0])
+            smoothed.append(curves[t][1])
+
+    # one row per team-season, as long as the longest season
+    n_games = max(len(row) for row in margins)
+    matrices = [np.full((len(labels), n_games), np.nan) for _ in range(2)]
+    for matrix, rows in zip(matrices, [margins, smoothed]):
+        for i, row in enumerate(rows):
+            matrix[i, :len(row)] = row
+    data = sourcing.margins_frame(labels, *matrices)
+
+    with style.context(plotting.STYLE):
+        fig = plotting.lineplot(data, labels, season)
+    fig.axes[0].set_title(f"Seasons with margins most like those of {franchises.name(team, season).title()} in {season-1}/{season}")
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the team-seasons whose margins were most like those of a team in a season.")
+    parser.add_argument("team", help="abbreviation of the team, f. ex. MIA")
+    parser.add_argument("season", type=int, help="ending year of the season, f. ex. 2022")
+    parser.add_argument("--k", type=int, default=5, help="number of team-seasons to find")
+    parser.add_argument("--metric", choices=METRICS, default="euclidean", help="distance between the curves")
+    parser.add_argument("--smoothing", default=smoothing.DEFAULT, help="smoothing of the margins (see main.py --smoothing)")
+    parser.add_argument("--plot", metavar="FILE", help="also plot the margins of the team-seasons found into FILE")
+    args = parser.parse_args()
+
+    if not archive.seasons():
+        parser.error("the margins archive is empty, build it first with python archive.py")
+    try:
+        spec = smoothing.parse(args.smoothing)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # (the team can also be given by its full name, f. ex. "Miami Heat")
+    team = franchises.resolve(args.team, args.season)
+    if team is None:
+        parser.error(f"unknown team '{args.team}' for season {args.season-1}/{args.season}")
+
+    try:
+        load_index(spec)
+        start = time.perf_counter()
+        matches = search(team, args.season, args.k, args.metric, spec)
+        duration = time.perf_counter() - start
+    except ValueError as error:
+        print(error)
+        raise SystemExit(1)
+    except OSError as error:
+        # f. ex. an HTTPError or a network error (of urllib or requests) while
+        # fetching the game log of a season that is not in the archive
+        print(f"The margins of {team} in season {args.season-1}/{args.season} could not be fetched: {error}")
+        raise SystemExit(1)
+
+    print(f"Most similar to {team} {args.season-1}/{args.season} ({args.metric}, {duration*1000:.1f}ms):")
+    for rank, (t, s, distance) in enumerate(matches, 1):
+        print(f"{rank:>3}. {t} {s-1}/{s}  {franchises.name(t, s).title():<30}{distance:>10.2f}")
+    if args.plot:
+        plot(team, args.season, matches, spec).savefig(args.plot, bbox_inches="tight")
+        print(f"\nThe plot has been saved to {args.plot}.")
@@ -0,0 +1,258 @@
+"""
+Smoothing of margin trajectories. A smoothing is given by a spec consisting of
+the kernel and its parameters, f. ex. "gaussian:3" (standard deviation in
+games), "ewma:10" (span in games), "rolling:7" (window in games) or
+"savgol:11:2" (window and polynomial order of a Savitzky-Golay filter). Every
+kernel smooths all rows of a teams x games matrix, for several parameter
+settings at once, and handles NaNs (games without a result).
+"""
+import math
+import lazy
+import cache
+import profiling
+
+np = lazy.module("numpy")
+ndimage = lazy.module("scipy.ndimage")
+signal = lazy.module("scipy.signal")
+
+
+# the smoothing used unless others are asked for
+DEFAULT = "gaussian:3"
+# number of parameters of every kernel
+KERNELS = {"gaussian": 1, "ewma": 1, "rolling": 1, "savgol": 2}
+
+
+def parse(spec):
+    """
+    Checks a smoothing spec and brings it into its canonical form.
+
+    Args:
+        spec (str): Kernel and parameters separated by colons, f. ex. "ewma:10"
+
+    Returns:
+        :return Canonical spec (str), raises a ValueError if 'spec' is no
+                valid spec
+    """
+    kernel, *params = spec.strip().lower().split(":")
+    if kernel not in KERNELS or len(params) != KERNELS[kernel]:
+        raise ValueError(f"'{spec}' is no smoothing; valid are f. ex. gaussian:3, ewma:10, rolling:7, savgol:11:2")
+    values = [float(param) for param in params]   # may raise a ValueError
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError(f"The parameters of '{spec}' must be finite")
+    if kernel == "savgol":
+        window, order = (int(value) for value in values)
+        if window % 2 == 0 or not 0 <= order < window:
+            raise ValueError("savgol needs an odd window that is larger than the polynomial order")
+        values = [window, order]
+    elif kernel == "rolling":
+        values = [int(values[0])]
+    if values[0] <= 0:
+        raise ValueError(f"The parameters of '{spec}' must be positive")
+    return ":".join([kernel] + [f"{value:g}" for value in values])
+
+
+def _params(spec):
+    kernel, *params = spec.split(":")
+    return kernel, [float(param) for param in params]
+
+
+def gaussian(margins, sigmas):
+    """
+    Gaussian filter by normalized convolution: NaNs are left out of the
+    weighted average, and the weights of the remaining values are
+    renormalized. The same applies to the first and last games, where the
+    kernel is cut off (instead of reflecting the margins like
+    ndimage.gaussian_filter1d() does by default), so that the result for a
+    team does not depend on the number of columns of 'margins'.
+
+    Args:
+        margins (ndarray): Margins, one row per team
+        sigmas (list): Standard deviations of the kernel (in games)
+
+    Returns:
+        :return List of smoothed margins (one ndarray per sigma)
+    """
+    valid = np.isfinite(margins)
+    values = np.where(valid, margins, 0)
+    smoothed = []
+    for sigma in sigmas:
+        weighted = ndimage.gaussian_filter1d(values, sigma=sigma, axis=1, mode="constant")
+        weights = ndimage.gaussian_filter1d(valid.astype(float), sigma=sigma, axis=1, mode="constant")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            smoothed.append(np.where(weights > 0, weighted / weights, np.nan))
+    return smoothed
+
+
+def rolling(margins, windows):
+    """
+    Centered rolling mean over the games with a result. All windows are
+    computed from the same cumulative sums.
+
+    Args:
+        margins (ndarray): Margins, one row per team
+        windows (list): Window sizes (in games)
+
+    Returns:
+        :return List of smoothed margins (one ndarray per window)
+    """
+    valid = np.isfinite(margins)
+    pad = int(max(windows))
+    # cumulative sums of the values and of the number of values, with 'pad'
+    # zeros on both sides, so that every window lies within the arrays
+    sums = np.cumsum(np.pad(np.where(valid, margins, 0), ((0, 0), (pad + 1, pad))), axis=1)
+    counts = np.cumsum(np.pad(valid.astype(float), ((0, 0), (pad + 1, pad))), axis=1)
+    games = np.arange(margins.shape[1]) + pad
+    smoothed = []
+    for window in windows:
+        window = int(window)
+        first = games - window // 2   # (index in the cumulative sums)
+        total = sums[:, first + window] - sums[:, first]
+        n = counts[:, first + window] - counts[:, first]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            smoothed.append(np.where(n > 0, total / n, np.nan))
+    return smoothed
+
+
+def ewma(margins, spans):
+    """
+    Exponentially weighted moving average (alpha = 2 / (span + 1)). NaNs are
+    skipped, and the weights are renormalized, like pandas' ewm(adjust=True).
+
+    Args:
+        margins (ndarray): Margins, one row per team
+        spans (list): Spans (in games)
+
+    Returns:
+        :return List of smoothed margins (one ndarray per span)
+    """
+    valid = np.isfinite(margins)
+    values = np.where(valid, margins, 0)
+    smoothed = []
+    for span in spans:
+        alpha = 2 / (span + 1)
+        # y[t] = (1 - alpha) * y[t-1] + x[t] for all rows at once
+        weighted = signal.lfilter([1], [1, alpha - 1], values, axis=1)
+        weights = signal.lfilter([1], [1, alpha - 1], valid.astype(float), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            smoothed.append(np.where(weights > 0, weighted / weights, np.nan))
+    return smoothed
+
+
+def savgol(margins, params):
+    """
+    Savitzky-Golay filter. Games without a result are interpolated linearly
+    first, as the filter cannot leave them out. Every row is only filtered up
+    to its last game with a result.
+
+    Args:
+        margins (ndarray): Margins, one row per team
+        params (list): (window, polynomial order) tuples
+
+    Returns:
+        :return List of smoothed margins (one ndarray per tuple)
+    """
+    filled = np.full(margins.shape, np.nan)
+    played = np.zeros(len(margins), dtype=int)
+    games = np.arange(margins.shape[1])
+    for i, row in enumerate(margins):
+        valid = np.isfinite(row)
+        if valid.any():
+            played[i] = games[valid][-1] + 1
+            filled[i] = np.interp(games, games[valid], row[valid])
+
+    smoothed = [np.full(margins.shape, np.nan) for _ in params]
+    # rows with the same number of games are filtered together
+    for n_games in np.unique(played[played > 0]):
+        rows = played == n_games
+        for result, (window, order) in zip(smoothed, params):
+            # the window cannot be larger than the number of games
+            window = min(int(window), n_games - (n_games % 2 == 0))
+            if window > order:
+                result[rows, :n_games] = signal.savgol_filter(
+                    filled[rows, :n_games], window, int(order), axis=1, mode="interp"
+                )
+    return smoothed
+
+
+def smooth(margins, specs):
+    """
+    Smooths all rows of 'margins' with each of the smoothings 'specs'. Every
+    kernel is run once for all rows and all of its parameter settings. There
+    are no smoothed margins after the last game with a result of a row (f. ex.
+    games of the running season that have not been played yet).
+
+    Args:
+        margins (ndarray): Margins, one row per team
+        specs (list): Canonical smoothing specs (see parse())
+
+    Returns:
+        :return Dictionary with the specs (keys) and the smoothed margins
+                (values, ndarrays of the same shape as 'margins')
+    """
+    by_kernel = {}
+    for spec in dict.fromkeys(specs):
+        kernel, params = _params(spec)
+        by_kernel.setdefault(kernel, []).append((spec, params))
+
+    # index of the first game after the last game with a result, per row
+    played = margins.shape[1] - np.argmax(np.isfinite(margins[:, ::-1]), axis=1)
+    played[~np.isfinite(margins).any(axis=1)] = 0
+    after = np.arange(margins.shape[1]) >= played[:, np.newaxis]
+
+    smoothed = {}
+    for kernel, settings in by_kernel.items():
+        if kernel == "savgol":
+            params = [tuple(params) for _, params in settings]
+        else:
+            params = [params[0] for _, params in settings]
+        function = {"gaussian": gaussian, "rolling": rolling, "ewma": ewma, "savgol": savgol}[kernel]
+        for (spec, _), result in zip(settings, function(margins, params)):
+            result[after] = np.nan
+            smoothed[spec] = result
+    return smoothed
+
+
+@profiling.timed("smoothed_margins")
+def smoothed_margins(teams, season, margins, specs):
+    """
+    Returns the smoothed margins of 'teams' in 'season' for all 'specs'. Each
+    (team, season, spec) is only smoothed once per run: results are kept in
+    the run store, and only the missing ones are computed, in one batch.
+
+    Args:
+        teams (list): The teams, one per row of 'margins'
+        season (int): The season
+        margins (ndarray): Margins, one row per team, one column per game
+        specs (list): Canonical smoothing specs (see parse())
+
+    Returns:
+        :return Dictionary with the specs (keys) and the smoothed margins
+                (values, ndarrays of the same shape as 'margins')
+    """
+    def key(team, spec):
+        return ("smoothed", team, season, spec)
+
+    smoothed = {spec: np.full(margins.shape, np.nan) for spec in specs}
+    # rows that have not been smoothed yet, per spec
+    missing = {}
+    for spec in specs:
+        for i, team in enumerate(teams):
+            row = cache.run_store.get(key(team, spec))
+            if row is None:
+                missing.setdefault(spec, []).append(i)
+            else:
+                smoothed[spec][i, :len(row)] = row
+
+    if missing:
+        rows = sorted({i for spec_rows in missing.values() for i in spec_rows})
+        computed = smooth(margins[rows], list(missing))
+        for spec, spec_rows in missing.items():
+            for i in spec_rows:
+                row = computed[spec][rows.index(i)]
+                smoothed[spec][i] = row
+                # stored without the trailing NaNs, as the number of columns
+                # depends on the other teams of the query
+                finite = np.flatnonzero(np.isfinite(row))
+                row = row[:finite[-1] + 1 if finite.size else 0].copy()
+                cache.remember(key(teams[i], spec), lambda: row)
+    return smoothed
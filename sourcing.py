@@ -1,16 +1,30 @@
 import utils
-import numpy as np
-import pandas as pd
-from scipy import ndimage
+import league
+import archive
+import franchises
+import fetching
+import warehouse
+import lazy
+import profiling
+import smoothing
 
+np = lazy.module("numpy")
+pd = lazy.module("pandas")
 
-def get_data(query):
+
+def get_data(query, terminate=True, smoothings=None):
     """
     Depending on the queried 'aspect', this function calls different other
     functions which scrape the corresponding data and prepare it for plotting
 
     Args:
         query (list): Queried aspect, team(s), and season
+        terminate (bool): Whether to terminate the program if no data is
+                          available for any of the queried teams (otherwise,
+                          the returned list of teams is empty)
+        smoothings (list): Smoothings of the margins (see smoothing.py), the
+                           first of which is the main one (defaults to
+                           smoothing.DEFAULT)
 
     Returns:
         :return All and only the required data in a pandas DataFrame, as well as
@@ -20,69 +34,143 @@ def get_data(query):
     aspect, teams, season = query
 
     if aspect == "mar":
-        data, teams_updated = get_margins(teams, season)
+        data, teams_updated = get_margins(teams, season, smoothings)
+    elif isinstance(season, range):
+        data, teams_updated = get_season_trends(aspect, teams, season)
     else:
         data, teams_updated = get_season_stats(aspect, teams, season)
 
-    if not teams_updated:
+    if not teams_updated and terminate:
         print("\nNo data available for visualization. Terminating program.\n")
         quit()
 
     return data, teams_updated
 
 
-def get_margins(teams, season):
+@profiling.timed("get_margins")
+def get_margins(teams, season, smoothings=None):
     """
     For each of the queried teams, this function scrapes the points scored by
     the team and its opponent in all matches the team played in the queried
     season, and then processes these points to obtain the winning/losing
-    margins. The margins are then further processed to obtain smoothed margins
-    for improved legibility. NaNs are handled.
+    margins (if the season is in the margins archive, the margins are read
+    from there instead, see archive.py). The margins of all teams are aligned
+    in one teams x games matrix, which is then smoothed in a single pass per
+    smoothing to obtain smoothed margins for improved legibility (see
+    smoothing.py). NaNs are handled.
 
     Args:
         teams (list): The queried teams
         season (int): The queried season
+        smoothings (list): Canonical smoothing specs, the first of which is
+                           the main one (defaults to smoothing.DEFAULT)
 
     Returns:
         :return Margins and smoothed margins for all teams in a pandas
                 DataFrame, as well as an updated list of teams from which all
                 teams for which not enough data is available have been removed.
     """
-    data_all_teams = pd.DataFrame()
-    teams_to_be_removed = []
+    smoothings = list(smoothings or [smoothing.DEFAULT])
 
-    for team in teams:
-        # scrape data from bbref
-        url = f"https://www.basketball-reference.com/teams/{team}/{season}_games.html"
-        data_team = list(pd.read_html(url))[0]  # read in HTML table as DataFrame
-
-        # drop rows that don't contain game results
-        data_team = data_team[data_team["G"] != "G"]
-
-        data_team["margin"] = np.subtract(
-            pd.to_numeric(data_team["Tm"]),   # from 'team' points,
-            pd.to_numeric(data_team["Opp"])   # subtract opponent points
-        )
-        # if not at least 75% of values are non-NaNs, do not consider this team
-        if not (data_team["margin"].count() > (3/4 * data_team["margin"].size)):
+    # margins of each team, one value per game (views of the archive, or
+    # computed from the game logs of the teams that are not in it)
+    rows = {}
+    if archive.has_season(season):
+        rows = {team: archive.read(team, season) for team in teams}
+        rows = {team: row for team, row in rows.items() if row is not None}
+    missing = [team for team in teams if team not in rows]
+    if missing:
+        game_logs = get_game_logs(missing, season)
+        for team in missing:
+            rows[team] = archive.game_margins(game_logs[team])
+
+    # number of games of each team (including games without a result)
+    n_games = np.array([len(rows[team]) for team in teams])
+    # one row per team, one column per game number; games without a result,
+    # and games after the last game of a team, are NaN
+    margins = np.full((len(teams), max(n_games, default=0)), np.nan)
+    for i, team in enumerate(teams):
+        margins[i, :n_games[i]] = rows[team]
+
+    # if not at least 75% of values are non-NaNs, do not consider a team
+    enough = np.isfinite(margins).sum(axis=1) > 3/4 * n_games
+    teams_updated = teams
+    for team, has_enough in zip(list(teams), enough):
+        if not has_enough:
             print(f"Too many missing values for {team}.")
-            teams_to_be_removed.append(team)
-            continue
+            teams_updated.remove(team)
+    margins = margins[enough]
 
-        data_team["smoothed"] = ndimage.gaussian_filter1d(data_team["margin"], sigma=3)
-        data_team = data_team.set_index("G")
+    smoothed = smoothing.smoothed_margins(teams_updated, season, margins, smoothings)
+    overlays = {spec: smoothed[spec] for spec in smoothings[1:]}
 
-        # append to main data frame
-        data_all_teams[f"{team}_margin"] = data_team["margin"]
-        data_all_teams[f"{team}_smoothed"] = data_team["smoothed"]
+    return margins_frame(teams_updated, margins, smoothed[smoothings[0]], overlays), teams_updated
 
-    teams_updated = teams
-    for team in teams_to_be_removed:
-        teams_updated.remove(team)
 
-    return data_all_teams, teams_updated
+def margins_frame(teams, margins, smoothed, overlays=None):
+    """
+    Builds the DataFrame returned by get_margins() from the margins matrix and
+    the smoothed margins matrices.
+
+    Args:
+        teams (list): The teams, one per row of the matrices
+        margins (ndarray): Margins, one row per team, one column per game
+        smoothed (ndarray): Smoothed margins of the same shape
+        overlays (dict): Further smoothings (keys) and their smoothed margins
+                         (values), which plotting.lineplot() overlays
+
+    Returns:
+        :return Margins and smoothed margins for all teams in a pandas
+                DataFrame (index: game number; columns "<team>_margin",
+                "<team>_smoothed" and "<team>_smoothed <smoothing>")
+    """
+    overlays = overlays or {}
+    matrices = [margins, smoothed] + list(overlays.values())
+    kinds = ["margin", "smoothed"] + [f"smoothed {spec}" for spec in overlays]
+    # interleave the matrices: one column each per team
+    return pd.DataFrame(
+        np.stack(matrices, axis=1).reshape(-1, margins.shape[1]).T,
+        index=pd.Index(np.arange(1, margins.shape[1] + 1), name="G"),
+        columns=[f"{team}_{kind}" for team in teams for kind in kinds]
+    )
+
+
+def get_game_logs(teams, season):
+    """
+    Obtains the game logs of all queried teams, from the warehouse if the
+    season has been backfilled, and by scraping bbref (concurrently)
+    otherwise.
+
+    Args:
+        teams (list): The queried teams
+        season (int): The queried season
+
+    Returns:
+        :return Dictionary with teams (keys) and their game logs (values, pandas
+                DataFrames containing only rows with game results)
+    """
+    # read the game logs from the warehouse if the season has been backfilled
+    if warehouse.has_season(season, "team_games"):
+        game_logs = {team: warehouse.read_team_games(team, season) for team in teams}
+        game_logs = {team: log for team, log in game_logs.items() if not log.empty}
+    else:
+        game_logs = {}
+
+    # download the game logs of all other teams concurrently
+    fetching.fetch_many([
+        (utils.team_games_url(team, season), season)
+        for team in teams if team not in game_logs
+    ])
 
+    for team in teams:
+        if team not in game_logs:
+            # scrape data from bbref (only rows with game results are kept)
+            game_logs[team] = utils.scrape_team_games(team, season)
 
+    return game_logs
+
+
+@profiling.timed("get_season_stats")
 def get_season_stats(aspect, teams, season):
     """
     Scraping average season statistics and preprocessing them according to the
@@ -94,25 +182,32 @@ def get_season_stats(aspect, teams, season):
         season (int): The queried season
 
     Returns:
-        :return Data required for visualizing 'aspect' in a pandas DataFrame, as
-                well as an updated list of teams from which all teams for which
-                no data is available have been removed.
+        :return Data required for visualizing 'aspect' in a pandas DataFrame
+                (with the league quantiles of its columns in
+                attrs["league"], see league.py), as well as an updated list
+                of teams from which all teams for which no data is available
+                have been removed.
     """
-    season_stats = utils.scrape_season_stats(season)
+    cols = utils.aspects().loc[aspect, "corresponding cols"]
 
-    # replacing team names by three-letter abbreviations
-    abbr = utils.abbreviations()
-    # (convert team names to all caps in order to suit the entries in 'abbr':)
-    season_stats["Team"] = season_stats["Team"].str.upper()
-    season_stats = season_stats.replace({"Team": abbr})
+    if warehouse.has_season(season):
+        # the warehouse loads only the columns 'cols' (of all teams, for the
+        # league quantiles below)
+        league_stats = warehouse.read_season_stats(season, cols=cols)
+    else:
+        league_stats = utils.scrape_season_stats(season)
 
-    season_stats = season_stats.set_index("Team")
+        # replacing team names by the abbreviations bbref uses in the season
+        league_stats["Team"] = utils.resolve_teams(league_stats["Team"], season)
 
-    # subset rows according to queried teams
-    season_stats = season_stats[season_stats.index.isin(teams)]
+        # (without the league average and other rows that are no teams)
+        league_stats = league_stats.dropna(subset=["Team"]).set_index("Team")
 
     # subset columns according to queried aspect
-    season_stats = season_stats[utils.aspects().loc[aspect, "corresponding cols"]]
+    league_stats = league_stats[cols]
+
+    # subset rows according to queried teams
+    season_stats = league_stats[league_stats.index.isin(teams)]
 
     # remove all teams for which at least one value is missing
     season_stats = season_stats.dropna(how="any")
@@ -124,4 +219,81 @@ def get_season_stats(aspect, teams, season):
             print(f"Data missing for {team}.")
             teams_updated.remove(team)
 
+    # quantiles of the whole league, for the median and the percentile bands
+    # drawn by the plots (from the table that has been loaded anyway, instead
+    # of the full league index)
+    season_stats.attrs["league"] = league.bands(league_stats, cols)
+
     return season_stats, teams_updated
+
+
+@profiling.timed("get_season_trends")
+def get_season_trends(aspect, teams, seasons):
+    """
+    Scraping average season statistics of several seasons and stacking them
+    into one teams x seasons x stats array, from which a DataFrame with one
+    row per season and one column per stat and team is built. Teams are
+    identified by their franchise, so that f. ex. the statistics of the
+    Seattle SuperSonics are included for the Oklahoma City Thunder.
+
+    Args:
+        aspect (str): Aspect to be visualized
+        teams (list): The queried franchise(s)
+        seasons (range): The queried seasons
+
+    Returns:
+        :return Data required for visualizing the trend of 'aspect' in a pandas
+                DataFrame (index: seasons, columns: (stat, team)), as well as
+                an updated list of teams from which all teams for which no data
+                is available have been removed.
+    """
+    cols = utils.aspects().loc[aspect, "corresponding cols"]
+
+    # download the league pages of all seasons concurrently (unless they are
+    # in the warehouse)
+    fetching.fetch_many([
+        (utils.season_stats_url(season), season)
+        for season in seasons if not warehouse.has_season(season)
+    ])
+
+    values = np.full((len(teams), len(seasons), len(cols)), np.nan)
+    for i, season in enumerate(seasons):
+        # teams of the queried franchises in this season
+        codes = {}
+        for team in teams:
+            code = franchises.code(team, season)
+            if code is not None:
+                codes[code] = team
+        if not codes:
+            continue
+
+        if warehouse.has_season(season):
+            season_stats = warehouse.read_season_stats(season, list(codes), cols)
+        else:
+            season_stats = utils.scrape_season_stats(season)
+            season_stats["Team"] = utils.resolve_teams(season_stats["Team"], season)
+            season_stats = season_stats.set_index("Team")
+            season_stats = season_stats[season_stats.index.isin(codes)]
+
+        # replace the teams by their franchises and order them like 'teams'
+        season_stats = season_stats[~season_stats.index.duplicated()]
+        season_stats = season_stats.rename(index=codes).reindex(teams)
+        values[:, i, :] = season_stats[cols].to_numpy(dtype=float)
+
+    # teams for which there is at least one value
+    available = ~np.isnan(values).all(axis=(1, 2))
+    teams_updated = teams
+    for team, is_available in zip(list(teams), available):
+        if not is_available:
+            print(f"Data missing for {team}.")
+            teams_updated.remove(team)
+    values = values[available]
+
+    # (teams, seasons, stats) -> (seasons, stats, teams) -> one row per season
+    trends = pd.DataFrame(
+        values.transpose(1, 2, 0).reshape(len(seasons), -1),
+        index=pd.Index(seasons, name="Season"),
+        columns=pd.MultiIndex.from_product([cols, teams_updated])
+    )
+
+    return trends, teams_updated
@@ -0,0 +1,65 @@
+"""
+Tests of adding seasons to the margins archive when the game logs of some
+teams cannot be fetched.
+"""
+import pytest
+
+import cache
+import archive
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def empty_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive, "_index", None)
+    monkeypatch.setattr(archive, "_margins", None)
+    monkeypatch.setattr(cache, "current_season", lambda: 2023)
+    cache.clear_run_store()
+    yield
+    cache.clear_run_store()
+
+
+def fake_season_margins(available, requested):
+    """
+    Stands in for archive._season_margins(): the game logs of 'available'
+    teams can be fetched, those of the others cannot. The teams asked for
+    are recorded in 'requested'.
+    """
+    def season_margins(season, season_teams=None):
+        season_teams = season_teams or ["MIA", "DAL", "BOS"]
+        requested.append(list(season_teams))
+        # (a page of this season, which must not outlive add_season())
+        cache.store(("html", season), "page")
+        margins = {team: np.arange(3, dtype=float) + i for i, team in enumerate(season_teams) if team in available}
+        return margins, [team for team in season_teams if team not in margins]
+    return season_margins
+
+
+def test_missing_teams_are_recorded_and_retried(empty_archive, monkeypatch):
+    requested = []
+    monkeypatch.setattr(archive, "_season_margins", fake_season_margins({"MIA", "BOS"}, requested))
+    cache.store(("html", "other"), "page of another season")
+
+    archive.build(2022, 2022)
+
+    assert archive.teams(2022) == ["MIA", "BOS"]
+    assert archive.missing_teams(2022) == ["DAL"]
+    assert archive.read("DAL", 2022) is None
+    # only the pages of the season are dropped
+    assert cache.stored_keys() == {("html", "other")}
+
+    monkeypatch.setattr(archive, "_season_margins", fake_season_margins({"MIA", "DAL", "BOS"}, requested))
+    archive.build(2022, 2022)
+
+    assert requested == [["MIA", "DAL", "BOS"], ["DAL"]]
+    assert archive.missing_teams(2022) == []
+    assert sorted(archive.teams(2022)) == ["BOS", "DAL", "MIA"]
+    assert archive.read("MIA", 2022).tolist() == [0, 1, 2]
+    assert archive.read("DAL", 2022).tolist() == [0, 1, 2]
+    assert archive.read("BOS", 2022).tolist() == [2, 3, 4]
+
+    # complete seasons are not fetched again
+    archive.build(2022, 2022)
+    assert len(requested) == 2
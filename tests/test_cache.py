@@ -0,0 +1,69 @@
+"""
+Tests of the run store (see cache.remember() and cache.store()): the
+accounting that decides when the oldest objects are dropped, and lookups of
+objects that are dropped at the same time.
+"""
+import pytest
+
+import cache
+
+
+@pytest.fixture(autouse=True)
+def empty_run_store():
+    cache.clear_run_store()
+    yield
+    cache.clear_run_store()
+
+
+def accounted():
+    return cache._used == sum(cache._sizes.values()) and set(cache._sizes) <= set(cache.run_store)
+
+
+def test_store_discard_and_clear_keep_the_accounting(monkeypatch):
+    monkeypatch.setattr(cache, "RUN_STORE_BYTES", 10_000)
+    cache.remember(("table", 1), lambda: "x" * 1000)
+    cache.store(("html", "a"), "y" * 1000)
+    # replacing an object must not count it twice
+    cache.store(("html", "a"), "z" * 2000)
+    assert cache.run_store[("html", "a")] == "z" * 2000
+    assert accounted() and len(cache._sizes) == 2
+
+    cache.discard(("table", 1))
+    assert ("table", 1) not in cache.run_store and accounted()
+
+    keys = {("html", i) for i in range(3)}
+    for key in keys:
+        cache.store(key, "p" * 1000)
+    cache.clear_run_store(keys)
+    assert cache.stored_keys() == {("html", "a")} and accounted()
+
+    cache.clear_run_store()
+    assert not cache.run_store and cache._used == 0
+
+
+def test_stored_pages_are_trimmed(monkeypatch):
+    monkeypatch.setattr(cache, "RUN_STORE_BYTES", 5_000)
+    for i in range(20):
+        cache.store(("html", i), "p" * 1000)
+    assert cache._used <= 5_000 and accounted()
+    # the newest pages are kept
+    assert ("html", 19) in cache.run_store and ("html", 0) not in cache.run_store
+
+
+class DroppedAfterLookup(dict):
+    """
+    Drops an object right after it has been found, like _trim() on another
+    thread would between a check and the read.
+    """
+
+    def __contains__(self, key):
+        found = dict.__contains__(self, key)
+        self.pop(key, None)
+        return found
+
+
+def test_remember_survives_objects_dropped_by_other_threads(monkeypatch):
+    monkeypatch.setattr(cache, "run_store", DroppedAfterLookup())
+    cache.remember(("table", 1), lambda: "t")
+
+    assert cache.remember(("table", 1), lambda: "rebuilt") in ("t", "rebuilt")
@@ -0,0 +1,155 @@
+"""
+Tests of fetching.py against a local HTTP server that answers with scripted
+status codes, so that the order of the results of fetch_many(), the retries
+and the rate limit can be checked without bbref.
+"""
+import time
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import cache
+import fetching
+import transports
+
+
+class ScriptedServer:
+    """
+    Answers every path with the scripted (status, headers) responses given
+    for it, one per request, and with 200 and the path as body once they are
+    used up. Every response is delayed by delays[path] seconds.
+    """
+
+    def __init__(self, script=None, delays=None):
+        self.script = {path: list(responses) for path, responses in (script or {}).items()}
+        self.delays = delays or {}
+        self.requests = []
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with lock:
+                    server.requests.append((self.path, time.monotonic()))
+                    responses = server.script.get(self.path)
+                    response = responses.pop(0) if responses else None
+                time.sleep(server.delays.get(self.path, 0))
+                if response is not None:
+                    status, headers = response
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = self.path.encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, path):
+        return sum(requested == path for requested, _ in self.requests)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UrllibTransport:
+    """
+    Sends the requests for bbref pages to the scripted server. urlopen()
+    raises a urllib.error.HTTPError (with the headers of the response) for
+    error statuses, like transports.LiveTransport does.
+    """
+
+    def __init__(self, base_url, live):
+        self.base_url = base_url
+        self.live = live
+
+    def get(self, url):
+        with urllib.request.urlopen(self.base_url + url[len(transports.BASE_URL):], timeout=10) as response:
+            return response.read().decode("utf-8")
+
+
+def url(path):
+    return transports.BASE_URL + path
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    servers = []
+
+    def start(script=None, delays=None, live=False):
+        scripted = ScriptedServer(script, delays)
+        servers.append(scripted)
+        fetching.set_transport(UrllibTransport(scripted.url, live))
+        return scripted
+
+    # pages of a live transport would end up in the page cache
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(fetching, "BACKOFF", 0.01)
+    monkeypatch.setattr(fetching, "_bucket", fetching._bucket)
+    cache.clear_run_store()
+    yield start
+    fetching.set_transport(None)
+    cache.clear_run_store()
+    for scripted in servers:
+        scripted.close()
+
+
+def test_fetch_many_returns_pages_in_input_order(server):
+    paths = [f"/teams/T{i:02}/2022_games.html" for i in range(8)]
+    # the first pages take longest, so they are completed last
+    server(delays={path: (len(paths) - i) * 0.03 for i, path in enumerate(paths)})
+
+    assert fetching.fetch_many([(url(path), 2022) for path in paths]) == paths
+
+
+def test_429_and_503_are_retried_after_retry_after(server):
+    path = "/leagues/NBA_2022.html"
+    scripted = server(script={path: [(429, {"Retry-After": "1"}), (503, {})]})
+
+    start = time.monotonic()
+    assert fetching.fetch_html(url(path), 2022) == path
+    assert scripted.count(path) == 3
+    # the backoff alone would have taken milliseconds
+    assert time.monotonic() - start >= 1
+
+
+def test_404_is_passed_through_without_retries(server):
+    missing, found = "/teams/XYZ/2022_games.html", "/teams/MIA/2022_games.html"
+    scripted = server(script={missing: [(404, {})] * (fetching.MAX_RETRIES + 1)})
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        fetching.fetch_html(url(missing), 2022)
+    assert error.value.code == 404
+    assert scripted.count(missing) == 1
+
+    results = fetching.fetch_many([(url(found), 2022), (url(missing), 2022)], return_exceptions=True)
+    assert results[0] == found
+    assert isinstance(results[1], urllib.error.HTTPError) and results[1].code == 404
+
+
+def test_token_bucket_rate_is_respected(server):
+    paths = [f"/teams/T{i:02}/2022_games.html" for i in range(6)]
+    scripted = server(live=True)
+    # 10 requests per second, without a burst
+    fetching.set_rate_limit(600, burst=1)
+
+    fetching.fetch_many([(url(path), 2022) for path in paths], max_workers=4)
+
+    times = sorted(t for _, t in scripted.requests)
+    assert len(times) == len(paths)
+    # the first request goes through at once, each further one 0.1s later
+    assert times[-1] - times[0] >= (len(paths) - 1) * 0.1 * 0.9
@@ -0,0 +1,79 @@
+"""
+Tests of the manifest of exported plots (see query_io.export()) when many
+plots are rendered on a pool of processes at the same time.
+"""
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import query_io
+
+FOLDER = "visualizations"
+
+
+def _record(i):
+    query_io._update_manifest(FOLDER, f"key{i}", f"plot{i}.png", float(i))
+
+
+def test_concurrent_manifest_updates_are_not_lost(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(FOLDER)
+
+    with ProcessPoolExecutor(max_workers=8) as executor:
+        list(executor.map(_record, range(200)))
+
+    manifest = query_io._read_manifest(FOLDER)
+    assert sorted(v["file"] for v in manifest.values()) == sorted(f"plot{i}.png" for i in range(200))
+
+
+def test_render_many_records_every_plot(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    import rendering
+
+    monkeypatch.chdir(tmp_path)
+    jobs = []
+    for i in range(40):
+        teams = [f"T{i:02}", f"U{i:02}"]
+        data = pd.DataFrame({"PTS": [100.0 + i, 110.0 - i]}, index=pd.Index(teams, name="Team"))
+        jobs.append((data, ["pts", teams, 2022]))
+
+    results = rendering.render_many(jobs, processes=4)
+
+    assert not [result for result in results if isinstance(result, Exception)]
+    files = sorted(f for f in os.listdir(FOLDER) if f.endswith(".png"))
+    with open(os.path.join(FOLDER, query_io.MANIFEST)) as f:
+        manifest = json.load(f)
+    assert len(files) == 40
+    assert sorted(entry["file"] for entry in manifest.values()) == files
+
+
+def _square(x):
+    return x * x
+
+
+def _no_setup():
+    pass
+
+
+def test_bounded_keeps_order_and_few_jobs_in_flight(monkeypatch):
+    import rendering
+
+    # (nothing is plotted, so the workers need no matplotlib backend)
+    monkeypatch.setattr(rendering, "_init_worker", _no_setup)
+
+    pulled = []
+
+    def jobs():
+        for i in range(50):
+            pulled.append(i)
+            yield i
+
+    results = []
+    for result in rendering._bounded(_square, jobs(), processes=2):
+        # jobs taken from the generator, but not yielded yet
+        assert len(pulled) - len(results) <= 2 * 2
+        results.append(result)
+    assert results == [i * i for i in range(50)]
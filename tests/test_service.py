@@ -0,0 +1,45 @@
+"""
+Tests of the in-memory caches of the plot service.
+"""
+import pytest
+
+import service
+import sourcing
+
+
+@pytest.fixture
+def prepared(monkeypatch):
+    calls = []
+
+    def get_data(query, terminate=True, smoothings=None):
+        calls.append(query)
+        return f"data of {query}", query[1]
+
+    monkeypatch.setattr(sourcing, "get_data", get_data)
+    monkeypatch.setattr(service, "_data", service.collections.OrderedDict())
+    monkeypatch.setattr(service, "MAX_DATA", 3)
+    return calls
+
+
+def test_data_is_kept_for_the_most_recent_queries(prepared):
+    queries = [["pts", [team], 2022] for team in ("MIA", "DAL", "BOS", "LAL")]
+    for query in queries[:3]:
+        service.get_data(query)
+    # MIA is used again, so DAL is the least recently used one
+    service.get_data(queries[0])
+    service.get_data(queries[3])
+
+    assert len(service._data) == 3
+    assert len(prepared) == 4
+    service.get_data(queries[0])
+    assert len(prepared) == 4
+    service.get_data(queries[1])
+    assert len(prepared) == 5
+
+
+def test_smoothings_are_part_of_the_key(prepared):
+    service.get_data(["mar", ["MIA"], 2022])
+    service.get_data(["mar", ["MIA"], 2022], ["gaussian:3"])
+    service.get_data(["mar", ["MIA"], 2022], ["ewma:10"])
+
+    assert len(prepared) == 2
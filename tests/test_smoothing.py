@@ -0,0 +1,21 @@
+"""
+Tests of the checks of smoothing specs (see smoothing.parse()).
+"""
+import pytest
+
+import smoothing
+
+
+def test_specs_are_canonical():
+    assert smoothing.parse(" Gaussian:3.0 ") == "gaussian:3"
+    assert smoothing.parse("rolling:7") == "rolling:7"
+    assert smoothing.parse("savgol:11:2") == "savgol:11:2"
+
+
+@pytest.mark.parametrize("spec", [
+    "gaussian:nan", "gaussian:inf", "ewma:-inf", "rolling:inf", "savgol:nan:2", "savgol:11:inf",
+    "gaussian:0", "ewma:-1", "rolling:0.5",
+])
+def test_non_finite_and_non_positive_parameters_are_rejected(spec):
+    with pytest.raises(ValueError):
+        smoothing.parse(spec)
@@ -0,0 +1,32 @@
+"""
+Tests of the league quantiles attached to the season statistics of a query
+(see sourcing.get_season_stats()), on generated league pages.
+"""
+import pytest
+
+pytest.importorskip("pandas")
+
+import cache
+import league
+import sourcing
+from benchmarks import fixtures
+
+
+@pytest.fixture
+def seeded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    cache.clear_run_store()
+    fixtures.seed(["MIA", "DAL"], [2022])
+    yield
+    cache.clear_run_store()
+
+
+@pytest.mark.parametrize("aspect", ["pts", "acc", "a/t"])
+def test_league_bands_without_the_league_index(seeded, aspect):
+    data, teams = sourcing.get_season_stats(aspect, ["MIA", "DAL"], 2022)
+
+    assert teams == ["MIA", "DAL"] and sorted(data.index) == ["DAL", "MIA"]
+    # the bands are computed from the table of the query ...
+    assert ("league", 2022) not in cache.stored_keys()
+    # ... and are those of the whole league
+    assert data.attrs["league"] == league.index(2022).bands(list(data.columns))
@@ -0,0 +1,225 @@
+"""
+Backends through which fetching.py downloads pages (see
+fetching.set_transport()):
+- LiveTransport downloads from bbref (or from a stand-in server) over a pool
+  of keep-alive connections, with compressed responses.
+- ReplayTransport serves pages that have been saved to a directory.
+- StandInServer is a local HTTP server in place of bbref, serving saved or
+  generated pages with an artificial latency, f. ex. for load tests.
+"""
+import os
+import gzip
+import time
+import argparse
+import threading
+import importlib.util
+import urllib.error
+import lazy
+import profiling
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# requests (and urllib3) are only imported once a page is downloaded
+requests = lazy.module("requests")
+adapters = lazy.module("requests.adapters")
+
+
+BASE_URL = "https://www.basketball-reference.com"
+# brotli responses can only be decoded if a brotli package is installed
+if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+    ACCEPT_ENCODING = "gzip, deflate, br"
+else:
+    ACCEPT_ENCODING = "gzip, deflate"
+TIMEOUT = 30
+
+
+def page_file_name(url):
+    """
+    Returns the name of the file under which the page under 'url' is saved,
+    f. ex. "NBA_2022.html" for a league page or "MIA_2022_games.html" for a
+    game log page.
+
+    Args:
+        url (str): URL of the page
+
+    Returns:
+        :return File name (str)
+    """
+    parts = url.rstrip("/").split("/")
+    if parts[-2] == "leagues":
+        return parts[-1]
+    return f"{parts[-2]}_{parts[-1]}"
+
+
+def _not_found(url, reason):
+    return urllib.error.HTTPError(url, 404, reason, {}, None)
+
+
+class LiveTransport:
+    """
+    Downloads pages over a requests.Session, which keeps up to 'pool_size'
+    connections alive and reuses them for further requests, and which
+    negotiates compressed responses. If 'base_url' is given, requests are sent
+    to it instead of bbref (f. ex. to a StandInServer); such downloads are
+    neither rate limited nor cached.
+    """
+
+    def __init__(self, base_url=None, pool_size=4):
+        self.base_url = base_url
+        self.live = base_url is None
+        self.session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+    def get(self, url):
+        """
+        Downloads the page under 'url'.
+
+        Args:
+            url (str): URL of the page on bbref
+
+        Returns:
+            :return HTML of the page (str), raises a urllib.error.HTTPError
+                    if the server answers with an error
+        """
+        if self.base_url is not None and url.startswith(BASE_URL):
+            url = self.base_url + url[len(BASE_URL):]
+        response = self.session.get(url, timeout=TIMEOUT)
+        if response.status_code >= 400:
+            raise urllib.error.HTTPError(url, response.status_code, response.reason, response.headers, None)
+        # bytes transferred (compressed), not the size of the page
+        profiling.add(bytes=int(response.headers.get("Content-Length", len(response.content))))
+        return response.content.decode("utf-8")
+
+
+class ReplayTransport:
+    """
+    Serves the pages saved in 'directory' (named like page_file_name()), f. ex.
+    by benchmarks/fixtures.py. Pages that have not been saved are answered
+    with HTTP 404, so nothing is ever downloaded. Without a directory, there
+    are no pages at all.
+    """
+
+    live = False
+
+    def __init__(self, directory=None):
+        self.directory = directory
+
+    def get(self, url):
+        """
+        Reads the saved page under 'url'.
+
+        Args:
+            url (str): URL of the page on bbref
+
+        Returns:
+            :return HTML of the page (str), raises a urllib.error.HTTPError
+                    if the page has not been saved
+        """
+        if self.directory is None:
+            raise _not_found(url, "Not Found (no pages to replay)")
+        path = os.path.join(self.directory, page_file_name(url))
+        if not os.path.isfile(path):
+            raise _not_found(url, f"Not Found ({page_file_name(url)} has not been saved)")
+        with open(path, "rb") as f:
+            body = f.read()
+        profiling.add(bytes=len(body))
+        return body.decode("utf-8")
+
+
+class StandInServer:
+    """
+    Local HTTP server that answers requests for bbref pages (same paths as on
+    bbref) after waiting 'latency' seconds. The pages are read from a
+    directory of saved pages, or obtained by calling a function with the URL
+    of the page on bbref, which returns the HTML or None. Responses are
+    gzip-compressed if the client accepts it.
+
+    Used as a context manager, the server runs in a background thread:
+        with StandInServer("pages/", latency=0.2) as server:
+            fetching.set_transport(LiveTransport(server.url))
+    """
+
+    def __init__(self, pages, latency=0.0, host="127.0.0.1", port=0):
+        if isinstance(pages, str):
+            replay = ReplayTransport(pages)
+            pages = lambda url: _read_saved(replay, url)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep connections alive
+
+            def do_GET(self):
+                time.sleep(latency)
+                html = pages(BASE_URL + self.path)
+                if html is None:
+                    self.send_error(404)
+                    return
+                body = html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass   # no log line per request
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread = None
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+
+        Returns:
+            :return The server itself
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving and closes the server.
+
+        Returns:
+            :return None
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def _read_saved(replay, url):
+    try:
+        return replay.get(url)
+    except urllib.error.HTTPError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve saved bbref pages locally in place of bbref.")
+    parser.add_argument("pages", help="directory of saved pages")
+    parser.add_argument("--latency", type=float, default=0.0, help="time to wait before every response in seconds")
+    parser.add_argument("--port", type=int, default=8001, help="port to listen on")
+    args = parser.parse_args()
+
+    server = StandInServer(args.pages, args.latency, port=args.port)
+    print(f"Serving {args.pages} on {server.url} (run the program with BBREF_BASE_URL={server.url})")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
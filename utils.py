@@ -1,5 +1,51 @@
-import requests
-import pandas as pd
+import io
+import lazy
+import cache
+import schema
+import parsing
+import fetching
+import profiling
+import franchises
+
+pd = lazy.module("pandas")
+
+# abbreviation, full description, short name, columns of the league page
+# the aspect refers to, and the season from which on the required data is
+# available on bbref, for every aspect
+_ASPECTS = [
+    ("mar", "Winning / losing margins for all games in the season", "margins", ["<doesn't apply>"], 1947),
+    ("pts", "Average points per game in the season", "points", ["PTS"], 1947),
+    ("orb", "Average number of offensive rebounds in the season", "offensive rebounds", ["ORB"], 1974),
+    ("drb", "Average number of defensive rebounds in the season", "defensive rebounds", ["DRB"], 1974),
+    ("acc", "Shooting accuracy in the season", "accuracy", ["3P%", "2P%", "FT%"], 1980),
+    ("a/t", "Average number of assists vs turnovers in the season", "assists/turnovers", ["AST", "TOV"], 1974),
+]
+
+
+def aspect_info():
+    """
+    Returns the information regarding the various aspects (see aspects()) as
+    plain dictionaries, without pandas. Used f. ex. in query_io.get_query()
+    when displaying the different aspect options and checking the input, so
+    that the dialogue starts without importing pandas.
+
+    Returns:
+        :return Dictionary with the abbreviations of the aspects (keys) and
+                dictionaries with the keys "full", "plot title", "short",
+                "file title", "corresponding cols" and "availability" (values)
+    """
+    return {
+        abbr: {
+            "full": full,
+            "plot title": full[:-14],
+            "short": short,
+            "file title": short.replace(" ", "_").replace("/", "_"),
+            "corresponding cols": cols,
+            "availability": availability
+        }
+        for abbr, full, short, cols, availability in _ASPECTS
+    }
+
 
 def aspects():
     """
@@ -7,135 +53,111 @@ def aspects():
     aspects, such as f. ex. a full description of what each aspect concretely
     refers to and from which year on the respectively required data is available
     on bbref.
-    Used f. ex. in query_io.get_query() when displaying the different aspect
-    options, in sourcing.get_season_stats() when subsetting the DataFrame, and
-    in plotting.simple_barplot() when defining the title of the plot.
+    Used f. ex. in sourcing.get_season_stats() when subsetting the DataFrame,
+    and in plotting.simple_barplot() when defining the title of the plot (the
+    terminal dialogue uses aspect_info() instead).
 
     Returns:
         :return Information regarding aspects in a pandas DataFrame
     """
-    aspects = pd.DataFrame()
-
-    aspects["abbr"] = pd.Series(["mar", "pts", "orb", "drb", "acc", "a/t"])
-    aspects["full"] = pd.Series([
-        "Winning / losing margins for all games in the season",
-        "Average points per game in the season",
-        "Average number of offensive rebounds in the season",
-        "Average number of defensive rebounds in the season",
-        "Shooting accuracy in the season",
-        "Average number of assists vs turnovers in the season"
-    ])
-    aspects["plot title"] = pd.Series([full[:-14] for full in aspects["full"]])
-    aspects["short"] = pd.Series([
-        "margins",
-        "points",
-        "offensive rebounds",
-        "defensive rebounds",
-        "accuracy",
-        "assists/turnovers"
-    ])
-    aspects["file title"] = pd.Series([s.replace(" ", "_").replace("/", "_") for s in aspects["short"]])
-    aspects["corresponding cols"] = pd.Series([
-        ["<doesn't apply>"],
-        ["PTS"],
-        ["ORB"],
-        ["DRB"],
-        ["3P%", "2P%", "FT%"],
-        ["AST", "TOV"]
-    ])
-    aspects["availability"] = pd.Series([1947, 1947, 1974, 1974, 1980, 1974])
-
-    aspects = aspects.set_index("abbr")
+    info = aspect_info()
+    aspects = pd.DataFrame(
+        {col: [values[col] for values in info.values()] for col in next(iter(info.values()))},
+        index=pd.Index(list(info), name="abbr")
+    )
 
     return aspects
 
 
-def abbreviations():
+def parse_seasons(text):
     """
-    Returns the abbreviations used on bbref for the different teams. All caps
-    entries enable case insensitive 'teams' input ('teams' input will match
-    regardless of case when also converted to all caps).
-    Taken from
-    https://github.com/sherpan/bbref_team_game_logs/blob/master/README.md
+    Converts the ending year of a season ("2022") or a span of seasons given by
+    the ending years of the first and the last season ("1990-2022").
+
+    Args:
+        text (str): The typed in season(s)
 
     Returns:
-        :return Dictionary with team names (keys) and corresponding
-                abbreviations (values)
-    """
-    abbr = {
-        "ATLANTA HAWKS" : "ATL",
-        "ST. LOUIS HAWKS" : "SLH",
-        "MILWAUKEE HAWKS" : "MIL",
-        "TRI-CITIES BLACKHAWKS" : "TRI",
-        "BOSTON CELTICS" : "BOS",
-        "BROOKLYN NETS" : "BRK",
-        "NEW JERSEY NETS" : "NJN",
-        "CHICAGO BULLS" : "CHI",
-        "CHARLOTTE HORNETS" : "CHO",
-        "CHARLOTTE BOBCATS" : "CHA",
-        "CLEVELAND CAVALIERS" : "CLE",
-        "DALLAS MAVERICKS" : "DAL",
-        "DENVER NUGGETS" : "DEN",
-        "DETROIT PISTONS" : "DET",
-        "FORT WAYNE PISTONS" : "FWP",
-        "GOLDEN STATE WARRIORS" : "GSW",
-        "SAN FRANCISCO WARRIORS" : "SFW",
-        "PHILADELPHIA WARRIORS" : "PHW",
-        "HOUSTON ROCKETS" : "HOU",
-        "INDIANA PACERS" : "IND",
-        "LOS ANGELES CLIPPERS" : "LAC",
-        "SAN DIEGO CLIPPERS" : "SDC",
-        "BUFFALO BRAVES" : "BUF",
-        "LOS ANGELES LAKERS" : "LAL",
-        "MINNEAPOLIS LAKERS" : "MIN",
-        "MEMPHIS GRIZZLIES" : "MEM",
-        "VANCOUVER GRIZZLIES" : "VAN",
-        "MIAMI HEAT" : "MIA",
-        "MILWAUKEE BUCKS" : "MIL",
-        "MINNESOTA TIMBERWOLVES" : "MIN",
-        "NEW ORLEANS PELICANS" : "NOP",
-        "NEW ORLEANS/OKLAHOMA CITY HORNETS" : "NOK",
-        "NEW ORLEANS HORNETS" : "NOH",
-        "NEW YORK KNICKS" : "NYK",
-        "OKLAHOMA CITY THUNDER" : "OKC",
-        "SEATTLE SUPERSONICS" : "SEA",
-        "ORLANDO MAGIC" : "ORL",
-        "PHILADELPHIA 76ERS" : "PHI",
-        "SYRACUSE NATIONALS" : "SYR",
-        "PHOENIX SUNS" : "PHO",
-        "PORTLAND TRAIL BLAZERS" : "POR",
-        "SACRAMENTO KINGS" : "SAC",
-        "KANSAS CITY KINGS" : "KCK",
-        "KANSAS CITY-OMAHA KINGS" : "KCK",
-        "CINCINNATI ROYALS" : "CIN",
-        "ROCHESTER ROYALS" : "ROR",
-        "SAN ANTONIO SPURS" : "SAS",
-        "TORONTO RAPTORS" : "TOR",
-        "UTAH JAZZ" : "UTA",
-        "NEW ORLEANS JAZZ" : "NOJ",
-        "WASHINGTON WIZARDS" : "WAS",
-        "WASHINGTON BULLETS" : "WAS",
-        "CAPITAL BULLETS" : "CAP",
-        "BALTIMORE BULLETS" : "BAL",
-        "CHICAGO ZEPHYRS" : "CHI",
-        "CHICAGO PACKERS" : "CHI",
-        "ANDERSON PACKERS" : "AND",
-        "CHICAGO STAGS" : "CHS",
-        "INDIANAPOLIS OLYMPIANS" : "IND",
-        "SHEBOYGAN RED SKINS" : "SRS",
-        "ST. LOUIS BOMBERS" : "STB",
-        "WASHINGTON CAPITOLS" : "WAS",
-        "WATERLOO HAWKS" : "WAT"
-    }
-    return abbr
+        :return The season (int), or the seasons (range)
+    """
+    if "-" in text:
+        first, last = (int(year) for year in text.split("-"))   # may raise a ValueError
+        if not first < last:
+            raise ValueError
+        return range(first, last + 1)
+    return int(text)
+
+
+def season_label(season):
+    """
+    Returns a legible representation of the season(s) for plot titles and
+    notifications, f. ex. "NBA season 2021/2022".
+
+    Args:
+        season (int or range): The queried season(s)
+
+    Returns:
+        :return Representation of the season(s) (str)
+    """
+    if isinstance(season, range):
+        league = "NBA" if season[0] >= 1950 else "BAA/NBA"
+        return f"{league} seasons {season[0]-1}/{season[0]} - {season[-1]-1}/{season[-1]}"
+    return f"{'NBA' if season >= 1950 else 'BAA'} season {season-1}/{season}"
+
+
+def season_file_title(season):
+    """
+    Returns the representation of the season(s) used in file names, f. ex.
+    "2021_2022" or "1989_1990-2021_2022".
+
+    Args:
+        season (int or range): The queried season(s)
 
+    Returns:
+        :return Representation of the season(s) (str)
+    """
+    if isinstance(season, range):
+        return f"{season[0]-1}_{season[0]}-{season[-1]-1}_{season[-1]}"
+    return f"{season-1}_{season}"
+
+
+def season_stats_url(season):
+    """
+    Returns the URL of the bbref page listing the statistics of all teams in
+    'season'.
+
+    Args:
+        season (int): The queried season
+
+    Returns:
+        :return URL (str)
+    """
+    return f"https://www.basketball-reference.com/leagues/{'NBA' if season > 1949 else 'BAA'}_{season}.html"
+
+
+def team_games_url(team, season):
+    """
+    Returns the URL of the bbref page listing all matches 'team' played in
+    'season'.
 
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The queried season
+
+    Returns:
+        :return URL (str)
+    """
+    return f"https://www.basketball-reference.com/teams/{team}/{season}_games.html"
+
+
+@profiling.timed("scrape_season_stats")
 def scrape_season_stats(season):
     """
     Scrapes the per-game statistics for all teams who participated in the
     season. This is used not only in sourcing.get_season_stats(), but also in
     query_io.get_query() to verify that all queried teams participated in the
-    queried season.
+    queried season. The table is scraped only once per run; every call
+    returns a copy of it, so callers may modify their copy.
 
     Args:
         season (int): The queried season
@@ -144,10 +166,57 @@ def scrape_season_stats(season):
         :return Season statistics (all teams, all aspects) in a pandas
                 DataFrame
     """
+    return cache.remember(
+        ("season stats", season),
+        lambda: _scrape_season_stats(season)
+    ).copy()
+
+
+def _scrape_season_stats(season):
+    html = fetching.fetch_html(season_stats_url(season), season)
+    return parse_season_stats(html)
+
+
+def parse_season_stats(html):
+    """
+    Extracts the table containing the per-game statistics of all teams from
+    the HTML of a league page. Only this table is parsed (see parsing.py);
+    should bbref ever rename it, all tables on the page are parsed and searched
+    for it instead. The table is cast to compact dtypes (see schema.py).
+
+    Args:
+        html (str): HTML of the league page
+
+    Returns:
+        :return Season statistics (all teams, all aspects) in a pandas
+                DataFrame
+    """
+    with profiling.span("parse table", table="season stats"):
+        season_stats = parsing.extract_table(html, parsing.SEASON_STATS_IDS)
+    if season_stats is None:
+        season_stats = _search_season_stats(html)
+
+    # preprocessing steps needed in both sourcing.get_season_stats() and
+    # query_io.get_query():
+    # removing asterisk from team name where necessary
+    for teamname in season_stats["Team"]:
+        if teamname[-1] == "*":
+            teamname_clean = teamname[:-1]
+            season_stats.loc[season_stats["Team"] == teamname, "Team"] = teamname_clean
+
+    return schema.season_stats(season_stats)
+
+
+def _search_season_stats(html):
+    """
+    Parses all tables on the league page and returns the one containing
+    per-game statistics.
+    """
     season_stats = pd.DataFrame()
 
-    url = f"https://www.basketball-reference.com/leagues/{'NBA' if season > 1949 else 'BAA'}_{season}.html"
-    tables = list(pd.read_html(url))   # get all tables on the specified webpage
+    # get all tables on the specified webpage
+    with profiling.span("read_html"):
+        tables = list(pd.read_html(io.StringIO(html)))
     # find the table containing per-game statistics
     for table in tables:
         try:
@@ -161,12 +230,72 @@ def scrape_season_stats(season):
             # we are looking for
             pass
 
-    # preprocessing steps needed in both sourcing.get_season_stats() and
-    # query_io.get_query():
-    # removing asterisk from team name where necessary
-    for teamname in season_stats["Team"]:
-        if teamname[-1] == "*":
-            teamname_clean = teamname[:-1]
-            season_stats.loc[season_stats["Team"] == teamname, "Team"] = teamname_clean
-
     return season_stats
+
+
+@profiling.timed("scrape_team_games")
+def scrape_team_games(team, season):
+    """
+    Scrapes the game log of 'team' in 'season', i.e. the table listing all
+    matches the team played in the season. This is used in
+    sourcing.get_margins() and in query_io.get_suitable_input(). The table is
+    scraped only once per run; every call returns a copy of it.
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The queried season
+
+    Returns:
+        :return Game log in a pandas DataFrame
+    """
+    return cache.remember(
+        ("team games", team, season),
+        lambda: _scrape_team_games(team, season)
+    ).copy()
+
+
+def _scrape_team_games(team, season):
+    # (may raise a urllib.error.HTTPError)
+    html = fetching.fetch_html(team_games_url(team, season), season)
+    return parse_team_games(html)
+
+
+def parse_team_games(html):
+    """
+    Extracts the table listing all matches of a team from the HTML of its game
+    log page. Only this table is parsed (see parsing.py); should bbref ever
+    rename it, the first table on the page is used instead. Rows that are no
+    games are removed, and the table is cast to compact dtypes (see
+    schema.py).
+
+    Args:
+        html (str): HTML of the game log page
+
+    Returns:
+        :return Game log in a pandas DataFrame
+    """
+    with profiling.span("parse table", table="team games"):
+        data_team = parsing.extract_table(html, parsing.TEAM_GAMES_IDS)
+    if data_team is None:
+        # read in HTML table as DataFrame
+        with profiling.span("read_html"):
+            data_team = list(pd.read_html(io.StringIO(html)))[0]
+    return schema.team_games(data_team)
+
+
+def resolve_teams(names, season):
+    """
+    Replaces the team names in the column 'names' of a season statistics table
+    by the abbreviations bbref uses for the teams in 'season' (None for rows
+    that are no teams, like the league average). Every distinct name is only
+    looked up once.
+
+    Args:
+        names (Series): Team names, f. ex. season_stats["Team"]
+        season (int): The season of the table
+
+    Returns:
+        :return Abbreviations (Series of str)
+    """
+    codes = {name: franchises.resolve(name, season) for name in names.unique()}
+    return names.astype(object).map(codes)
@@ -0,0 +1,221 @@
+import os
+import json
+import lazy
+import cache
+import utils
+import argparse
+import fetching
+import urllib.error
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+pd = lazy.module("pandas")
+# the warehouse is optional, everything works without pyarrow
+if lazy.available("pyarrow"):
+    pa = lazy.module("pyarrow")
+    pq = lazy.module("pyarrow.parquet")
+else:
+    pa = None
+    pq = None
+
+
+# directory of the local warehouse (can be redirected by setting the
+# environment variable BBREF_WAREHOUSE_DIR)
+WAREHOUSE_DIR = os.environ.get(
+    "BBREF_WAREHOUSE_DIR",
+    os.path.join(cache.CACHE_DIR, "warehouse")
+)
+CHECKPOINT_FILE = "checkpoint.json"
+FIRST_SEASON = 1947
+LAST_SEASON = 2022
+# columns of the game logs that are stored (all that sourcing needs)
+GAME_COLS = ["G", "Date", "Tm", "Opp"]
+
+
+def _partition(table, season):
+    return os.path.join(WAREHOUSE_DIR, table, f"season={season}", "part-0.parquet")
+
+
+def has_season(season, table="season_stats"):
+    """
+    Checks whether 'table' has been backfilled for 'season' (and whether the
+    warehouse can be read at all, which requires pyarrow).
+
+    Args:
+        season (int): The queried season
+        table (str): "season_stats" or "team_games"
+
+    Returns:
+        :return True if the partition exists, False otherwise
+    """
+    return pq is not None and os.path.isfile(_partition(table, season))
+
+
+def read_season_stats(season, teams=None, cols=None):
+    """
+    Reads the per-game statistics of 'teams' in 'season' from the warehouse.
+    Only the columns 'cols' and only the rows of 'teams' are loaded.
+
+    Args:
+        season (int): The queried season
+        teams (list): The queried teams (abbreviations), all teams if None
+        cols (list): The columns required for the queried aspect, all
+                     columns if None
+
+    Returns:
+        :return Season statistics in a pandas DataFrame indexed by team
+                abbreviation
+    """
+    if teams is None:
+        filters = [("Abbr", "!=", "")]   # (rows that are no teams have no abbreviation)
+    else:
+        filters = [("Abbr", "in", list(teams))]
+    table = pq.read_table(
+        _partition("season_stats", season),
+        columns=None if cols is None else ["Abbr"] + list(cols),
+        filters=filters
+    )
+    table = table.to_pandas().set_index("Abbr").rename_axis("Team")
+    return table.drop(columns=["Team"], errors="ignore")
+
+
+def read_team_games(team, season):
+    """
+    Reads the game log of 'team' in 'season' from the warehouse.
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The queried season
+
+    Returns:
+        :return Game log (columns GAME_COLS) in a pandas DataFrame
+    """
+    table = pq.read_table(
+        _partition("team_games", season),
+        columns=GAME_COLS,
+        filters=[("Team", "=", team)]
+    )
+    return table.to_pandas()
+
+
+def _write(df, table, season):
+    """
+    Writes 'df' as the partition of 'table' for 'season'. The file is written
+    under a temporary name first, so that an interrupted backfill never leaves
+    a partial partition behind.
+    """
+    path = _partition(table, season)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def backfill_season(season):
+    """
+    Scrapes the per-game team statistics and the game logs of all teams of
+    'season' and writes them to the warehouse.
+
+    Args:
+        season (int): The season to backfill
+
+    Returns:
+        :return Abbreviations of the teams whose game log could not be fetched
+                (list)
+    """
+    season_stats = utils.scrape_season_stats(season)
+    season_stats["Abbr"] = utils.resolve_teams(season_stats["Team"], season)
+
+    missing = []
+    game_logs = []
+    teams = list(season_stats["Abbr"].dropna().unique())
+    for team in teams:
+        try:
+            data_team = utils.scrape_team_games(team, season)
+        except urllib.error.HTTPError:
+            missing.append(team)
+            continue
+        # (only rows with game results, in compact dtypes, see schema.py)
+        data_team = data_team[GAME_COLS].copy()
+        data_team["Date"] = data_team["Date"].astype(str)
+        data_team["Team"] = team
+        game_logs.append(data_team)
+
+    _write(season_stats, "season_stats", season)
+    if game_logs:
+        _write(pd.concat(game_logs, ignore_index=True), "team_games", season)
+    # free the memory of this season before the worker takes the next one
+    cache.clear_run_store()
+
+    return missing
+
+
+def _read_checkpoint():
+    path = os.path.join(WAREHOUSE_DIR, CHECKPOINT_FILE)
+    if not os.path.isfile(path):
+        return {"completed": [], "missing teams": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(checkpoint):
+    path = os.path.join(WAREHOUSE_DIR, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def _init_worker(requests_per_minute):
+    # every worker process has its own rate limiter, so they share the limit
+    fetching.set_rate_limit(requests_per_minute, burst=1)
+
+
+def backfill(first=FIRST_SEASON, last=LAST_SEASON, processes=4):
+    """
+    Backfills the warehouse with all seasons from 'first' to 'last' using a
+    pool of processes. Every completed season is recorded in a checkpoint
+    file, so an interrupted backfill continues where it stopped when it is
+    started again.
+
+    Args:
+        first (int): First season to backfill
+        last (int): Last season to backfill
+        processes (int): Number of worker processes
+
+    Returns:
+        :return None
+    """
+    if pq is None:
+        print("The warehouse requires pyarrow (conda install pyarrow).")
+        return
+    os.makedirs(WAREHOUSE_DIR, exist_ok=True)
+    checkpoint = _read_checkpoint()
+    seasons = [s for s in range(first, last + 1) if s not in checkpoint["completed"]]
+    print(f"Backfilling {len(seasons)} season(s) into {WAREHOUSE_DIR} ...")
+
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(fetching.REQUESTS_PER_MINUTE / processes,)
+    ) as executor:
+        futures = {executor.submit(backfill_season, s): s for s in seasons}
+        for future in as_completed(futures):
+            season = futures[future]
+            try:
+                missing = future.result()
+            except Exception as error:
+                # not recorded as completed, so it is retried on the next run
+                print(f"Season {season-1}/{season} failed: {error}")
+                continue
+            checkpoint["completed"].append(season)
+            if missing:
+                checkpoint["missing teams"][str(season)] = missing
+            _write_checkpoint(checkpoint)
+            print(f"Season {season-1}/{season} done{f' (no game log for {missing})' if missing else ''}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the local warehouse with bbref season tables and game logs.")
+    parser.add_argument("--first", type=int, default=FIRST_SEASON, help="ending year of the first season")
+    parser.add_argument("--last", type=int, default=LAST_SEASON, help="ending year of the last season")
+    parser.add_argument("--processes", type=int, default=4, help="number of worker processes")
+    args = parser.parse_args()
+    backfill(args.first, args.last, args.processes)
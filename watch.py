@@ -0,0 +1,169 @@
+import time
+import cache
+import utils
+import argparse
+import fetching
+import sourcing
+import smoothing
+import rendering
+import lazy
+import franchises
+
+np = lazy.module("numpy")
+
+
+# time between two polls in seconds
+INTERVAL = 60 * 60
+SIGMA = 3
+# number of games on either side of a game that enter its smoothed margin
+# (the radius of the kernel of smoothing.gaussian() with sigma=SIGMA)
+RADIUS = int(4.0 * SIGMA + 0.5)
+
+
+def played_margins(team, season):
+    """
+    Downloads the current game log of 'team' and computes the margins of all
+    games that have already been played.
+
+    Args:
+        team (str): Abbreviation bbref uses for the team
+        season (int): The running season
+
+    Returns:
+        :return Margins of all played games (ndarray)
+    """
+    html = fetching.refresh_html(utils.team_games_url(team, season), season)
+    # the parsed game log in the run store is outdated now
+    cache.discard(("team games", team, season))
+    data_team = utils.parse_team_games(html)
+
+    margins = np.subtract(
+        data_team["Tm"].to_numpy(dtype=float, na_value=np.nan),
+        data_team["Opp"].to_numpy(dtype=float, na_value=np.nan)
+    )
+    # cut off the games that have not been played yet
+    played = np.flatnonzero(np.isfinite(margins))
+    return margins[:played[-1] + 1] if played.size else margins[:0]
+
+
+def update(state, margins):
+    """
+    Updates the stored margins and smoothed margins of one team with its
+    current margins. If games were only appended, only the tail of the
+    smoothed margins that the new games affect is recomputed: the smoothed
+    margin of a game depends on the RADIUS games on either side of it.
+
+    Args:
+        state (dict): Stored "margins" and "smoothed" margins of the team (both
+                      ndarrays), updated in place
+        margins (ndarray): Margins of all games played so far
+
+    Returns:
+        :return True if the margins changed, False otherwise
+    """
+    old = state.get("margins")
+    if old is not None and np.array_equal(old, margins, equal_nan=True):
+        return False
+
+    n_old = len(old) if old is not None else 0
+    appended = (
+        old is not None and len(margins) > n_old
+        and np.array_equal(margins[:n_old], old, equal_nan=True)
+    )
+    if appended:
+        # smoothed margins from 'start' on change; recomputing them requires
+        # the RADIUS games before 'start'
+        start = max(n_old - RADIUS, 0)
+        window = max(start - RADIUS, 0)
+        tail = smoothing.gaussian(margins[np.newaxis, window:], [SIGMA])[0][0]
+        smoothed = np.concatenate((state["smoothed"][:start], tail[start - window:]))
+    else:
+        # first poll, or earlier results were corrected
+        smoothed = smoothing.gaussian(margins[np.newaxis, :], [SIGMA])[0][0]
+
+    state["margins"] = margins
+    state["smoothed"] = smoothed
+    return True
+
+
+def render(teams, states, season):
+    """
+    Renders and exports the margins plot of 'teams' from their stored
+    margins.
+
+    Args:
+        teams (list): The teams of the plot
+        states (dict): Stored margins and smoothed margins of all teams
+        season (int): The running season
+
+    Returns:
+        :return Path of the saved file (str)
+    """
+    n_games = max(len(states[team]["margins"]) for team in teams)
+    margins = np.full((len(teams), n_games), np.nan)
+    smoothed = np.full((len(teams), n_games), np.nan)
+    for i, team in enumerate(teams):
+        margins[i, :len(states[team]["margins"])] = states[team]["margins"]
+        smoothed[i, :len(states[team]["smoothed"])] = states[team]["smoothed"]
+    data = sourcing.margins_frame(teams, margins, smoothed)
+    path, _ = rendering.render(data, ["mar", teams, season])
+    return path
+
+
+def watch(plots, interval=INTERVAL, rounds=None):
+    """
+    Polls the game logs of all teams in 'plots' in the running season and
+    re-renders a plot whenever the margins of one of its teams have changed.
+
+    Args:
+        plots (list): Lists of teams (bbref abbreviations), one per plot
+        interval (float): Time between two polls in seconds
+        rounds (int): Number of polls (polls until interrupted if None)
+
+    Returns:
+        :return None
+    """
+    season = cache.current_season()
+    teams = list(dict.fromkeys(team for plot in plots for team in plot))
+    states = {team: {} for team in teams}
+
+    poll = 0
+    while rounds is None or poll < rounds:
+        changed = set()
+        for team in teams:
+            try:
+                margins = played_margins(team, season)
+            except Exception as error:
+                print(f"Could not poll {team}: {error}")
+                continue
+            if update(states[team], margins):
+                changed.add(team)
+
+        for plot in plots:
+            if changed.intersection(plot) and all(states[team] for team in plot):
+                print(f"{time.strftime('%H:%M')} {', '.join(plot)}: {render(plot, states, season)}")
+
+        poll += 1
+        if rounds is None or poll < rounds:
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-render margins plots of the running season whenever new games have been played.")
+    parser.add_argument("--teams", action="append", required=True, help="comma-separated teams of one plot (repeat for several plots)")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="time between two polls in seconds")
+    parser.add_argument("--rounds", type=int, help="number of polls (default: until interrupted)")
+    args = parser.parse_args()
+
+    season = cache.current_season()
+    plots = []
+    for teams in args.teams:
+        plot = [franchises.resolve(team.strip(), season) for team in teams.split(",")]
+        if None in plot:
+            parser.error(f"unknown team in '{teams}' for season {season-1}/{season}")
+        plots.append(plot)
+
+    try:
+        watch(plots, args.interval, args.rounds)
+    except KeyboardInterrupt:
+        pass